@@ -1,40 +1,88 @@
 # app.py
 import os
 import json
-from flask import Flask, request, jsonify
+import base64
+import functools
+import html
+import zlib
+from datetime import datetime
+from flask import Flask, Response, request, jsonify, make_response
 from flask_cors import CORS
-from database import SessionLocal, init_db, Article, Keyword
-from scheduler import start_scheduler, job
-from sqlalchemy import or_, func
+from config import RESPONSE_CACHE_SIZE, SCHEDULER_MODE, SCHEDULE_MODE, EXPORT_BATCH_SIZE
+from database import (
+    SessionLocal, WriteSessionLocal, init_db, fts_available, newest_first, FTS_TABLE,
+    Article, ArticleTag, ArticleFingerprint, Keyword, chunked,
+)
+from response_cache import ResponseCache, current_generation, bump_generation
+from scheduler import start_scheduler, job, scrape_status, schedule_retag
+from scrape_metrics import render_prometheus, recent_runs
+from feed_schedule import schedule_summary
+from work_queue import queue_summary
+from profiling import init_profiling
+from near_dup import backfill_fingerprints
+from retention import ArchiveSession, ArchivedArticle, ArchivedArticleTag, archive_exists
+from sqlalchemy import and_, or_, func, text, literal_column, table
 
 # ------------------ APP / BOOTSTRAP ------------------
 
+# Content extraction processes (see content_fetcher.py) re-import the main script as
+# __mp_main__ when that is this file (`python app.py`); only the real app bootstraps.
+_BOOTSTRAP = __name__ != "__mp_main__"
+
 # Initialize DB (no longer clears by default; set RESET_DB=1 to clear Articles)
-init_db()
+if _BOOTSTRAP:
+    init_db()
+    backfill_fingerprints()  # no-op once fingerprints are current
 
 app = Flask(__name__)
 CORS(app)
+init_profiling(app)
 
-start_scheduler()
+if _BOOTSTRAP:
+    # Returns immediately by default; the initial scrape runs in the background (see /ready)
+    start_scheduler(SCHEDULER_MODE)
 
 TAGS_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tags.json")
 
-def _canon_token(t: str) -> str:
-    # Canonical tag token for matching
-    return (t or "").strip().lower()
+RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_SIZE)
 
-def _canon_tags_expr():
+def _cached_response(key_func):
     """
-    SQL expression that normalizes Article.tags for robust LIKE matching:
-    - lowercases the whole string
-    - removes single spaces adjacent to commas: ', ' -> ',' and ' ,' -> ','
-      (handles the common 'comma + optional space' formatting issue)
+    Serve a view from RESPONSE_CACHE. key_func() returns a hashable key for the
+    normalized request, or None if this request shouldn't be cached.
+    Only 200 responses are stored. Every response carries an ETag, and a matching
+    If-None-Match gets a 304. The cache generation is part of the key, so
+    bump_generation() (scrapes, keyword edits, set_tags) invalidates everything.
     """
-    # func.replace is nested: first ', ' → ',', then ' ,' → ','
-    no_space_adjacent_commas = func.replace(
-        func.replace(Article.tags, ', ', ','), ' ,', ','
-    )
-    return func.lower(no_space_adjacent_commas)
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = key_func() if RESPONSE_CACHE_SIZE > 0 else None
+            if key is None:
+                return view(*args, **kwargs)
+
+            key = (current_generation(),) + key
+            hit = RESPONSE_CACHE.get(key)
+            if hit is None:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                body = resp.get_data()
+                hit = (body, RESPONSE_CACHE.put(key, body))
+
+            body, etag = hit
+            if request.if_none_match.contains(etag):
+                resp = Response(status=304)
+            else:
+                resp = Response(body, status=200, mimetype="application/json")
+            resp.set_etag(etag)
+            return resp
+        return wrapper
+    return decorator
+
+def _canon_token(t: str) -> str:
+    # Canonical tag token for matching
+    return (t or "").strip().lower()
 
 def _parse_tags_query_args():
     """
@@ -61,23 +109,41 @@ def _parse_tags_query_args():
 
 # --- has_articles enrichment ----------------------------------------------
 
-def _tags_with_has_articles(session, base_tags):
+def _tag_stats(session, tokens):
+    """
+    {tok: (article_count, latest_published_date)} for the given canonical tokens.
+    One GROUP BY over the article_tags (tag, published_date) index per 500 tokens,
+    so it is a single query for any realistic tag list.
+    """
+    stats = {}
+    for chunk in chunked(dict.fromkeys(tokens)):
+        rows = (
+            session.query(ArticleTag.tag, func.count(ArticleTag.article_id), func.max(ArticleTag.published_date))
+                   .filter(ArticleTag.tag.in_(chunk))
+                   .group_by(ArticleTag.tag)
+                   .all()
+        )
+        stats.update({tag: (count, latest) for (tag, count, latest) in rows})
+    return stats
+
+def _tags_with_has_articles(session, base_tags, include_counts=False):
     """
     base_tags: Iterable[str] tag names as displayed (not necessarily canonicalized).
-    Robustly check existence regardless of whitespace/case artifacts in DB.
+    Existence comes from article_tags, so case/whitespace artifacts in the legacy
+    Article.tags strings don't matter.
+    include_counts adds "article_count" and "latest_published_date" (same query).
     """
+    base_tags = [t for t in base_tags if t]
+    stats = _tag_stats(session, [tok for tok in map(_canon_token, base_tags) if tok])
+
     results = []
-    canon_expr = _canon_tags_expr()
     for t in base_tags:
-        if not t:
-            continue
-        tok = _canon_token(t)
-        if not tok:
-            results.append({"tag": t, "has_articles": False})
-            continue
-        pattern = f'%,{tok},%'
-        exists = session.query(Article.id).filter(canon_expr.like(pattern)).first() is not None
-        results.append({"tag": t, "has_articles": bool(exists)})
+        count, latest = stats.get(_canon_token(t), (0, None))
+        item = {"tag": t, "has_articles": count > 0}
+        if include_counts:
+            item["article_count"] = count
+            item["latest_published_date"] = latest.isoformat() if latest else None
+        results.append(item)
     return results
 
 def _load_canonical_tags():
@@ -113,9 +179,52 @@ def _save_canonical_tags(tags_list):
 def index():
     return "Web Scraper API is running."
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe: 200 once the DB answers, with this process's scrape progress.
+    The API serves (possibly stale) articles while the initial scrape is still running.
+    """
+    try:
+        with SessionLocal() as s:
+            s.execute(text("SELECT 1"))
+        db_ok = True
+    except Exception:
+        db_ok = False
+    body = {"ready": db_ok, "scrape": scrape_status()}
+    return jsonify(body), (200 if db_ok else 503)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Scrape metrics from the scrape_runs table, in Prometheus text format.
+    ?format=json returns the latest runs (?limit=, default 10) with per-feed stats instead.
+    """
+    with SessionLocal() as s:
+        if request.args.get("format") == "json":
+            try:
+                limit = max(1, min(int(request.args.get("limit", 10)), 100))
+            except ValueError:
+                return jsonify({"error": "limit must be an integer."}), 400
+            return jsonify({"runs": recent_runs(s, limit=limit)})
+        return Response(render_prometheus(s), mimetype="text/plain; version=0.0.4")
+
+@app.route('/feeds/schedule', methods=['GET'])
+def feed_schedule():
+    """Learned publish rate, poll interval and next poll time per feed (SCHEDULE_MODE=adaptive)."""
+    with SessionLocal() as s:
+        return jsonify({"mode": SCHEDULE_MODE, "feeds": schedule_summary(s)})
+
+@app.route('/feeds/queue', methods=['GET'])
+def feed_queue():
+    """Leases and due times in feed_work_queue (python worker.py --queue, see work_queue.py)."""
+    with SessionLocal() as s:
+        return jsonify({"items": queue_summary(s)})
+
 # ------------------ KEYWORDS CRUD ------------------
 
 @app.route('/keywords', methods=['GET'])
+@_cached_response(lambda: ("keywords",))
 def list_keywords():
     """Return all keywords (lowercased, DB canonical form)."""
     with SessionLocal() as s:
@@ -152,7 +261,7 @@ def add_keywords():
         return jsonify({"added": [], "skipped": [], "message": "No valid keywords."}), 200
 
     added, skipped = [], []
-    with SessionLocal() as s:
+    with WriteSessionLocal() as s:
         existing_set = {v for (v,) in s.query(Keyword.value).all()}
         for v in incoming:
             if v in existing_set:
@@ -160,8 +269,12 @@ def add_keywords():
                 continue
             s.add(Keyword(value=v))
             added.append(v)
+        if added:
+            bump_generation(s)
         s.commit()
 
+    # Tag articles already stored that mention the new keywords
+    schedule_retag(added=added)
     return jsonify({"added": added, "skipped": skipped}), 200
 
 @app.route('/keywords', methods=['DELETE'])
@@ -177,7 +290,7 @@ def delete_keywords_bulk():
         return jsonify({"error": "Provide 'keywords' as a non-empty list of strings."}), 400
 
     removed, not_found = [], []
-    with SessionLocal() as s:
+    with WriteSessionLocal() as s:
         existing = {v: kid for (kid, v) in s.query(Keyword.id, Keyword.value).all()}
         for v in to_remove:
             kid = existing.get(v)
@@ -186,7 +299,10 @@ def delete_keywords_bulk():
                 removed.append(v)
             else:
                 not_found.append(v)
+        if removed:
+            bump_generation(s)
         s.commit()
+    schedule_retag(removed=removed)
     return jsonify({"removed": removed, "not_found": not_found}), 200
 
 @app.route('/keywords/<path:value>', methods=['DELETE'])
@@ -195,101 +311,184 @@ def delete_keyword_single(value):
     v = (value or "").strip().lower()
     if not v:
         return jsonify({"error": "Keyword cannot be empty."}), 400
-    with SessionLocal() as s:
+    with WriteSessionLocal() as s:
         row = s.query(Keyword).filter(Keyword.value == v).first()
         if not row:
             return jsonify({"removed": [], "not_found": [v]}), 200
         s.delete(row)
+        bump_generation(s)
         s.commit()
-        return jsonify({"removed": [v], "not_found": []}), 200
+    schedule_retag(removed=[v])
+    return jsonify({"removed": [v], "not_found": []}), 200
 
+# --- /articles filter fix --------------------------------------------------
 # ------------------ ARTICLES ------------------
-def _canon_token(t: str) -> str:
-    # Canonical tag token for matching
-    return (t or "").strip().lower()
 
-def _canon_tags_expr():
+def _serialize_article(article):
+    tags_list = (
+        article.tags.strip(",").split(",")
+        if article.tags else []
+    )
+    tags_list = [t.strip() for t in tags_list if t]
+    return {
+        "id": article.id,
+        "title": article.title,
+        "url": article.url,
+        "published_date": (
+            article.published_date.isoformat()
+            if article.published_date else None
+        ),
+        "summary": article.summary,
+        "source": article.source,
+        "tags": tags_list,
+    }
+
+def _encode_cursor(article, archived=False):
     """
-    SQL expression that normalizes Article.tags for robust LIKE matching:
-    - lowercases the whole string
-    - removes single spaces adjacent to commas: ', ' -> ',' and ' ,' -> ','
-      (handles the common 'comma + optional space' formatting issue)
+    Opaque keyset cursor: the (published_date, id) of the last row on a page, marked
+    "archive" when that row came from the archive (the next page continues there).
     """
-    # func.replace is nested: first ', ' → ',', then ' ,' → ','
-    no_space_adjacent_commas = func.replace(
-        func.replace(Article.tags, ', ', ','), ' ,', ','
-    )
-    return func.lower(no_space_adjacent_commas)
+    key = [article.published_date.isoformat() if article.published_date else None, article.id]
+    if archived:
+        key.append("archive")
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
 
-def _parse_tags_query_args():
+def _decode_cursor(token):
+    """Inverse of _encode_cursor: (published, id, archived). Raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        published, article_id, *marker = json.loads(raw)
+        if marker not in ([], ["archive"]):
+            raise ValueError(marker)
+        return (datetime.fromisoformat(published) if published else None), int(article_id), bool(marker)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def _after_cursor(query, published, article_id, model=Article):
     """
-    Accepts both:
-      /articles?tags=alpha&tags=beta
-    and
-      /articles?tags=alpha,beta
-    Returns a list of canonical tokens (trimmed, lowercased), deduped.
+    Rows strictly after (published, article_id) in (published_date DESC, id DESC) order.
+    NULL dates sort last, as SQLite does for DESC.
     """
-    # getlist captures repeated ?tags=...
-    items = request.args.getlist('tags')
-    # If client sent a single comma-joined value, split it
-    if len(items) == 1 and ',' in items[0]:
-        items = [p for p in items[0].split(',')]
-
-    out = []
-    seen = set()
-    for raw in items:
-        tok = _canon_token(raw)
-        if tok and tok not in seen:
-            seen.add(tok)
-            out.append(tok)
-    return out
+    if published is None:
+        return query.filter(model.published_date.is_(None), model.id < article_id)
+    return query.filter(or_(
+        model.published_date < published,
+        and_(model.published_date == published, model.id < article_id),
+        model.published_date.is_(None),
+    ))
+
+def _archive_query(session, tokens):
+    """Same filter/order as the hot search, against the archive DB (see retention.py)."""
+    query = session.query(ArchivedArticle)
+    if tokens:
+        tagged_ids = session.query(ArchivedArticleTag.article_id).filter(ArchivedArticleTag.tag.in_(tokens))
+        query = query.filter(ArchivedArticle.id.in_(tagged_ids))
+    return query
+
+def _serialize_archived(article):
+    item = _serialize_article(article)
+    item["archived"] = True
+    return item
+
+def _collapse_clusters(session, query):
+    """
+    Hide articles clustered under another article (see near_dup.py) while that
+    article is still live, so each story appears once.
+    """
+    members = (
+        session.query(ArticleFingerprint.article_id)
+               .filter(ArticleFingerprint.cluster_id != ArticleFingerprint.article_id,
+                       ArticleFingerprint.cluster_id.in_(session.query(Article.id)))
+    )
+    return query.filter(~Article.id.in_(members))
+
+def _add_duplicate_counts(session, articles_data):
+    """Set "duplicates" (other live articles in the same cluster) on live results."""
+    ids = [a["id"] for a in articles_data if not a.get("archived")]
+    if not ids:
+        return
+    counts = dict(
+        session.query(ArticleFingerprint.cluster_id, func.count())
+               .filter(ArticleFingerprint.cluster_id.in_(ids))
+               .group_by(ArticleFingerprint.cluster_id)
+    )
+    for item in articles_data:
+        if not item.get("archived"):
+            item["duplicates"] = max(0, counts.get(item["id"], 0) - 1)
 
-# --- has_articles enrichment ----------------------------------------------
+def _fts_match_expr(q):
+    """
+    Turn free text into a safe FTS5 MATCH expression: every term is quoted (so
+    operators/punctuation in user input can't cause syntax errors) and terms are
+    ANDed. A trailing * keeps prefix matching: "hyperson*".
+    """
+    terms = []
+    for raw in q.split():
+        prefix = raw.endswith("*")
+        term = raw.rstrip("*").replace('"', "")
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+# highlight()/snippet() wrap matches in these; the text is HTML-escaped before they become <mark>
+_HL_START, _HL_END = "\x02", "\x03"
+
+def _marked(fragment):
+    if fragment is None:
+        return None
+    return html.escape(fragment, quote=False).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
 
-def _tags_with_has_articles(session, base_tags):
+def _fts_search(session, match_expr, tokens, page, page_size, include_total, collapse=False):
     """
-    base_tags: Iterable[str] tag names as displayed (not necessarily canonicalized).
-    Robustly check existence regardless of whitespace/case artifacts in DB.
+    Ranked full-text search over title/summary/content (FTS5 bm25; title weighted
+    highest). The index holds tag-stripped text, and highlights are escaped text
+    with only <mark> as markup. Returns (total_or_None, [serialized article + rank/highlights]).
     """
+    fts = literal_column(FTS_TABLE)
+    rowid = literal_column(f"{FTS_TABLE}.rowid")
+    rank = func.bm25(fts, 10.0, 3.0, 1.0)
+
+    query = (
+        session.query(
+            Article,
+            rank.label("rank"),
+            func.highlight(fts, 0, _HL_START, _HL_END).label("title_hl"),
+            func.snippet(fts, -1, _HL_START, _HL_END, "…", 24).label("snippet"),
+        )
+        .select_from(Article)
+        .join(table(FTS_TABLE), rowid == Article.id)
+        .filter(fts.match(match_expr))
+    )
+    if tokens:
+        tagged_ids = session.query(ArticleTag.article_id).filter(ArticleTag.tag.in_(tokens))
+        query = query.filter(Article.id.in_(tagged_ids))
+    if collapse:
+        query = _collapse_clusters(session, query)
+
+    total = query.with_entities(func.count()).scalar() if include_total else None
+    rows = (
+        query.order_by(rank, Article.id.desc())
+             .offset((page - 1) * page_size)
+             .limit(page_size)
+             .all()
+    )
     results = []
-    canon_expr = _canon_tags_expr()
-    for t in base_tags:
-        if not t:
-            continue
-        tok = _canon_token(t)
-        if not tok:
-            results.append({"tag": t, "has_articles": False})
-            continue
-        pattern = f'%,{tok},%'
-        exists = session.query(Article.id).filter(canon_expr.like(pattern)).first() is not None
-        results.append({"tag": t, "has_articles": bool(exists)})
-    return results
-
-# --- /articles filter fix --------------------------------------------------
-# ------------------ ARTICLES ------------------
-
-@app.route('/articles/search', methods=['POST'])
-def search_articles():
+    for article, score, title_hl, snippet in rows:
+        item = _serialize_article(article)
+        item["rank"] = score
+        item["highlights"] = {"title": _marked(title_hl), "snippet": _marked(snippet)}
+        results.append(item)
+    if collapse:
+        _add_duplicate_counts(session, results)
+    return total, results
+
+def _parse_search_body(data):
     """
-    Search articles with optional tag filters.
-    Accepts JSON body instead of long query strings.
-
-    Example body:
-      {
-        "page": 1,
-        "page_size": 25,
-        "tags": ["AI", "SpaceX", "Fusion Energy"]
-      }
-
-    Returns:
-      {
-        "page": 1,
-        "page_size": 25,
-        "total": <int>,
-        "articles": [ ... ]
-      }
+    Validate/normalize a /articles/search body.
+    Returns (params, None) or (None, error_message).
     """
-    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        data = {}
 
     # Defaults + guards
     try:
@@ -304,10 +503,29 @@ def search_articles():
     page = max(1, page)
     page_size = max(1, min(page_size, 500))  # clamp upper bound
 
+    cursor_mode = "cursor" in data
+    cursor = data.get("cursor")
+    if cursor is not None and not isinstance(cursor, str):
+        return None, "'cursor' must be a string or null"
+    include_total = bool(data.get("include_total", not cursor_mode))
+    include_archive = bool(data.get("include_archive", False))
+    collapse = bool(data.get("collapse_clusters", False))
+
+    q = data.get("q")
+    if q is not None and not isinstance(q, str):
+        return None, "'q' must be a string"
+    match_expr = _fts_match_expr(q) if q else None
+    if q and not match_expr:
+        return None, "'q' has no searchable terms"
+    if match_expr and cursor_mode:
+        return None, "'cursor' pagination is not supported with 'q'; use 'page'"
+    if match_expr and include_archive:
+        return None, "'include_archive' is not supported with 'q'"
+
     # Normalize tags
     raw_tags = data.get("tags", [])
     if not isinstance(raw_tags, list):
-        return jsonify({"error": "'tags' must be a list of strings"}), 400
+        return None, "'tags' must be a list of strings"
 
     tokens = []
     seen = set()
@@ -318,41 +536,160 @@ def search_articles():
                 seen.add(tok)
                 tokens.append(tok)
 
+    return {
+        "page": page,
+        "page_size": page_size,
+        "cursor_mode": cursor_mode,
+        "cursor": cursor or None,
+        "include_total": include_total,
+        "include_archive": include_archive,
+        "collapse": collapse,
+        "tokens": tokens,
+        "match": match_expr,
+    }, None
+
+def _search_cache_key():
+    params, error = _parse_search_body(request.get_json(silent=True) or {})
+    if error:
+        return None
+    # Tag filter is any-of, so token order doesn't change the result
+    return (
+        "search", params["page"], params["page_size"], params["cursor_mode"],
+        params["cursor"], params["include_total"], tuple(sorted(params["tokens"])), params["match"],
+        params["include_archive"], params["collapse"],
+    )
+
+@app.route('/articles/search', methods=['POST'])
+@_cached_response(_search_cache_key)
+def search_articles():
+    """
+    Search articles with optional tag filters.
+    Accepts JSON body instead of long query strings.
+
+    Example body:
+      {
+        "page": 1,
+        "page_size": 25,
+        "tags": ["AI", "SpaceX", "Fusion Energy"]
+      }
+
+    Returns:
+      {
+        "page": 1,
+        "page_size": 25,
+        "total": <int>,
+        "articles": [ ... ]
+      }
+
+    Cursor mode: send "cursor" (null/"" for the first page, then the returned
+    "next_cursor") instead of "page". Every page costs the same regardless of depth,
+    and no COUNT runs unless "include_total": true.
+      {"page_size": 25, "tags": [...], "cursor": null}
+      -> {"page_size": 25, "next_cursor": "<opaque>" | null, "articles": [ ... ]}
+
+    Archive: add "include_archive": true to continue into articles moved out by the
+    retention job (see retention.py) once the live ones run out. Archived articles
+    carry "archived": true. Not available with "q".
+
+    Near-duplicates: add "collapse_clusters": true to show each syndicated story once
+    (the first-seen article of its cluster, see near_dup.py). Live results then carry
+    "duplicates": the number of hidden copies. Works in every mode.
+
+    Full-text mode: add "q" (free text, "term*" for prefixes). Results are ranked by
+    relevance instead of date, still filtered by "tags", paginated with "page", and
+    each article gets "rank" and "highlights": {"title", "snippet"} (<mark> tags).
+      {"q": "small modular reactor", "tags": ["nuclear"], "page": 1}
+    """
+    data = request.get_json(silent=True) or {}
+    params, error = _parse_search_body(data)
+    if error:
+        return jsonify({"error": error}), 400
+    page, page_size, tokens = params["page"], params["page_size"], params["tokens"]
+    cursor_mode, cursor, include_total = params["cursor_mode"], params["cursor"], params["include_total"]
+    collapse = params["collapse"]
+    # Everything archived is older than everything live, so the archive simply continues the list
+    use_archive = params["include_archive"] and archive_exists()
+
+    if params["match"]:
+        if not fts_available():
+            return jsonify({"error": "Full-text search is not available on this database."}), 501
+        with SessionLocal() as session:
+            total, articles_data = _fts_search(
+                session, params["match"], tokens, page, page_size, include_total, collapse
+            )
+        return jsonify({
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "articles": articles_data
+        }), 200
+
     with SessionLocal() as session:
         query = session.query(Article)
 
         if tokens:
-            canon_expr = _canon_tags_expr()
-            conditions = [canon_expr.like(f'%,{tok},%') for tok in tokens]
-            query = query.filter(or_(*conditions))
-
-        query = query.order_by(Article.published_date.desc())
-        total = query.count()
-        articles = (
-            query.offset((page - 1) * page_size)
-                 .limit(page_size)
-                 .all()
-        )
-
-        articles_data = []
-        for article in articles:
-            tags_list = (
-                article.tags.strip(",").split(",")
-                if article.tags else []
-            )
-            tags_list = [t.strip() for t in tags_list if t]
-            articles_data.append({
-                "id": article.id,
-                "title": article.title,
-                "url": article.url,
-                "published_date": (
-                    article.published_date.isoformat()
-                    if article.published_date else None
-                ),
-                "summary": article.summary,
-                "source": article.source,
-                "tags": tags_list,
-            })
+            # Any-of match, resolved through the article_tags (tag, published_date) index
+            tagged_ids = session.query(ArticleTag.article_id).filter(ArticleTag.tag.in_(tokens))
+            query = query.filter(Article.id.in_(tagged_ids))
+        if collapse:
+            query = _collapse_clusters(session, query)
+
+        total = query.count() if include_total or (use_archive and not cursor_mode) else None
+        # id breaks ties so pages are stable; matches ix_articles_published_id
+        query = query.order_by(*newest_first(Article))
+
+        if cursor_mode:
+            after, in_archive = None, False
+            if cursor:
+                try:
+                    *after, in_archive = _decode_cursor(cursor)
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+            if in_archive:
+                rows = []  # every live row, NULL-dated ones included, came before the archive
+            else:
+                if after:
+                    query = _after_cursor(query, *after)
+                # One extra row tells us whether there is a next page without counting
+                rows = query.limit(page_size + 1).all()
+            live_rows = len(rows)
+            articles_data = [_serialize_article(a) for a in rows[:page_size]]
+            if use_archive and len(rows) <= page_size:
+                with ArchiveSession() as cold:
+                    cq = _archive_query(cold, tokens)
+                    if include_total:
+                        total += cq.count()
+                    if in_archive:
+                        # A live cursor is never applied here: the archive starts from its first row
+                        cq = _after_cursor(cq, *after, model=ArchivedArticle)
+                    cq = cq.order_by(ArchivedArticle.published_date.desc(), ArchivedArticle.id.desc())
+                    rows += cq.limit(page_size + 1 - len(rows)).all()
+                    articles_data += [_serialize_archived(a) for a in rows[len(articles_data):page_size]]
+            elif use_archive and include_total:
+                with ArchiveSession() as cold:
+                    total += _archive_query(cold, tokens).count()
+            next_cursor = (_encode_cursor(rows[page_size - 1], archived=page_size > live_rows)
+                           if len(rows) > page_size else None)
+        else:
+            offset = (page - 1) * page_size
+            articles = query.offset(offset).limit(page_size).all()
+            articles_data = [_serialize_article(a) for a in articles]
+            if use_archive:
+                with ArchiveSession() as cold:
+                    cq = _archive_query(cold, tokens)
+                    hot_total, total = total, total + cq.count()
+                    if len(articles) < page_size:
+                        cq = cq.order_by(ArchivedArticle.published_date.desc(), ArchivedArticle.id.desc())
+                        archived = cq.offset(max(0, offset - hot_total)).limit(page_size - len(articles)).all()
+                        articles_data += [_serialize_archived(a) for a in archived]
+        if collapse:
+            _add_duplicate_counts(session, articles_data)
+
+    if cursor_mode:
+        body = {"page_size": page_size, "next_cursor": next_cursor, "articles": articles_data}
+        if total is not None:
+            body["total"] = total
+        return jsonify(body), 200
 
     return jsonify({
         "page": page,
@@ -361,40 +698,140 @@ def search_articles():
         "articles": articles_data
     }), 200
 
+_EXPORT_COLUMNS = (
+    Article.id, Article.title, Article.url, Article.published_date,
+    Article.summary, Article.source, Article.tags,
+)
+
+def _parse_export_args():
+    """Validated /articles/export query args, or (None, error message)."""
+    args = request.args
+    params = {"tokens": _parse_tags_query_args(), "include_content": args.get("include_content") == "1"}
+    for name in ("from", "to", "since"):
+        value = args.get(name)
+        try:
+            params[name] = datetime.fromisoformat(value) if value else None
+        except ValueError:
+            return None, f"'{name}' must be an ISO 8601 date or datetime"
+    for name in ("since_id", "limit"):
+        value = args.get(name)
+        try:
+            params[name] = int(value) if value else None
+        except ValueError:
+            return None, f"'{name}' must be an integer"
+    if params["limit"] is not None and params["limit"] < 1:
+        return None, "'limit' must be positive"
+    return params, None
+
+def _export_query(session, params):
+    columns = _EXPORT_COLUMNS + ((Article.content,) if params["include_content"] else ())
+    query = session.query(*columns)
+    if params["tokens"]:
+        tagged_ids = session.query(ArticleTag.article_id).filter(ArticleTag.tag.in_(params["tokens"]))
+        query = query.filter(Article.id.in_(tagged_ids))
+    if params["from"]:
+        query = query.filter(Article.published_date >= params["from"])
+    if params["to"]:
+        query = query.filter(Article.published_date < params["to"])
+
+    since, since_id = params["since"], params["since_id"]
+    if since is not None:
+        # published_date watermark; since_id (the last row's id) breaks ties within one timestamp
+        after = Article.published_date > since
+        if since_id is not None:
+            after = or_(after, and_(Article.published_date == since, Article.id > since_id))
+        query = query.filter(after).order_by(Article.published_date.asc(), Article.id.asc())
+    else:
+        if since_id is not None:
+            query = query.filter(Article.id > since_id)
+        query = query.order_by(Article.id.asc())
+    if params["limit"]:
+        query = query.limit(params["limit"])
+    return query
+
+def _export_lines(params):
+    """NDJSON chunks of EXPORT_BATCH_SIZE rows, read through a streaming cursor."""
+    with SessionLocal() as session:
+        batch = []
+        for row in _export_query(session, params).yield_per(EXPORT_BATCH_SIZE):
+            item = _serialize_article(row)
+            if params["include_content"]:
+                item["content"] = row.content
+            batch.append(json.dumps(item, ensure_ascii=False))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield ("\n".join(batch) + "\n").encode("utf-8")
+                batch = []
+        if batch:
+            yield ("\n".join(batch) + "\n").encode("utf-8")
+
+def _gzip_chunks(chunks):
+    # gzip container; level 1 is about twice as fast as the default 6 for ~5% more bytes
+    compressor = zlib.compressobj(1, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/articles/export', methods=['GET'])
+def export_articles():
+    """
+    Stream matching articles as NDJSON (one search-shaped article per line), read
+    from the database in EXPORT_BATCH_SIZE batches, so memory stays flat however
+    many rows match. No COUNT or OFFSET; responses are not cached.
+
+    Query args (all optional):
+      tags=a,b          any-of tag filter (repeated or comma-separated)
+      from=, to=        published_date >= from and < to (ISO 8601)
+      since_id=N        only ids > N, in id order: store the last id and pass it
+                        back for the next incremental sync
+      since=<datetime>  only published_date > since, in (published_date, id) order;
+                        with since_id too, rows at exactly `since` with a larger id
+                        are included, so an export cut off by `limit` resumes cleanly
+      limit=N           stop after N rows
+      include_content=1 add the extracted article body ("content")
+
+    Sent gzip-compressed when the client accepts it (Accept-Encoding: gzip).
+    Note that new articles can carry a published_date older than the last sync;
+    the id watermark never misses them.
+    """
+    params, error = _parse_export_args()
+    if error:
+        return jsonify({"error": error}), 400
+
+    chunks = _export_lines(params)
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-store"}
+    if request.accept_encodings["gzip"] > 0:
+        chunks = _gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks, mimetype="application/x-ndjson", headers=headers)
 
 
-# ------------------ TAGS (GET / SET ALL) ------------------
 
-def _tags_with_has_articles(session, base_tags):
-    """
-    base_tags: Iterable[str] of tag names (already deduped/sorted)
-    Returns: [{"tag": str, "has_articles": bool}, ...]
-    """
-    results = []
-    for t in base_tags:
-        if not t:
-            continue
-        # Articles.tags stored like ",tag1,tag2,"; match whole tokens reliably
-        pattern = f'%,{t},%'
-        exists = session.query(Article.id).filter(Article.tags.like(pattern)).first() is not None
-        results.append({"tag": t, "has_articles": bool(exists)})
-    return results
+# ------------------ TAGS (GET / SET ALL) ------------------
 
 @app.route('/tags', methods=['GET'])
+@_cached_response(lambda: (
+    "tags",
+    request.args.get('include_has_articles') == '1',
+    request.args.get('include_counts') == '1',
+))
 def get_tags():
     """
     Returns:
       - Default (legacy): array of strings (canonical or aggregated)
       - If include_has_articles=1: array of objects [{tag, has_articles}]
+      - Adding include_counts=1 also returns article_count and latest_published_date
     """
     include_has = request.args.get('include_has_articles') == '1'
+    include_counts = request.args.get('include_counts') == '1'
 
     canonical = _load_canonical_tags()
     if canonical is not None:
         if not include_has:
             return jsonify(canonical)
         with SessionLocal() as session:
-            enriched = _tags_with_has_articles(session, canonical)
+            enriched = _tags_with_has_articles(session, canonical, include_counts)
             return jsonify(enriched)
 
     # Fallback: aggregate from Article.tags (legacy behavior)
@@ -414,7 +851,7 @@ def get_tags():
         if not include_has:
             return jsonify(base_tags)
 
-        enriched = _tags_with_has_articles(session, base_tags)
+        enriched = _tags_with_has_articles(session, base_tags, include_counts)
         return jsonify(enriched)
 
 @app.route('/tags', methods=['PUT', 'POST'])
@@ -427,8 +864,10 @@ def set_tags():
       - Default response: {"tags": [ ...sanitized... ]}
       - If query param include_has_articles=1 is present, respond with
         a JSON array of objects: [{"tag": "...","has_articles": bool}, ...]
+        (plus article_count / latest_published_date with include_counts=1)
     """
     include_has = request.args.get('include_has_articles') == '1'
+    include_counts = request.args.get('include_counts') == '1'
 
     data = request.get_json(silent=True)
     if not isinstance(data, dict) or "tags" not in data:
@@ -442,13 +881,14 @@ def set_tags():
     tags = [t.replace('"', '') for t in tags]
 
     _save_canonical_tags(tags)
+    bump_generation()
 
     if not include_has:
         return jsonify({"tags": tags}), 200
 
     # Enriched response path
     with SessionLocal() as session:
-        enriched = _tags_with_has_articles(session, tags)
+        enriched = _tags_with_has_articles(session, tags, include_counts)
     return jsonify(enriched), 200
 
 
@@ -0,0 +1,1246 @@
+# benchmark.py
+"""
+Benchmarks for the scraper/API hot paths.
+
+Micro-benchmarks (old vs new implementation of one piece):
+
+    python benchmark.py keywords [--sizes 400,5000,50000]
+    python benchmark.py tags [--sizes 10000,100000,1000000]
+    python benchmark.py stream [--entries 50,500] [--content-kb 20]
+    python benchmark.py fts [--sizes 10000,100000,1000000]
+    python benchmark.py parity                   # feed_stream == feedparser, field by field
+    python benchmark.py neardup [--db articles.db] [--distances 3,5,7,9]   # SimHash recall vs false positives
+
+End-to-end, against the real app/scraper code with a scratch database and
+synthetic feeds served from a local HTTP server:
+
+    python benchmark.py fetch [--delay 1] [--workers 4] [--per-host 2]   # slow hosts, per-host limit, timeout
+    python benchmark.py content [--busy-pages 40] [--idle-pages 4] [--interval 0.2]   # body fetch per domain
+    python benchmark.py scrape [--feeds 10,50] [--entries 100] [--content-kb 5]
+    python benchmark.py matching [--extra-keywords 0,1000,10000]
+    python benchmark.py api [--sizes 10000,100000] [--tag-counts 0,1,3,10] [--pages 1,10,100]
+    python benchmark.py export [--sizes 10000,100000]      # paged search vs NDJSON stream
+    python benchmark.py suite [--out results.json]   # scrape + matching + api, small sizes
+    python benchmark.py concurrency [--articles 20000] [--write-rows 20000] [--readers 4]
+    python benchmark.py workers [--workers 1,4] [--feeds 40]   # worker.py --queue processes, one DB
+
+Each section prints one JSON document so runs can be diffed. Nothing writes to
+articles.db (neardup reads it read-only): DATABASE_URI is always pointed at a
+temporary file, unless BENCH_DATABASE_URI names a scratch database to use
+instead (e.g. a throwaway PostgreSQL database; the end-to-end sections drop and
+recreate its tables).
+"""
+import argparse
+import atexit
+import contextlib
+import hashlib
+import html
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import sqlite3
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+# Must happen before config/database are imported: the end-to-end sections use the
+# app's own engine, so give it a scratch DB, and keep the scheduler, the content
+# fetcher and the response cache out of the timings.
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="maura-bench-")
+atexit.register(shutil.rmtree, _SCRATCH_DIR, True)
+os.environ["DATABASE_URI"] = os.environ.get("BENCH_DATABASE_URI") or "sqlite:///" + os.path.join(_SCRATCH_DIR, "app.db")
+os.environ.setdefault("SCHEDULER_MODE", "off")
+os.environ.setdefault("CONTENT_FETCH", "0")
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+
+import feedparser
+
+from sqlalchemy import create_engine, func, or_, text
+from sqlalchemy.orm import sessionmaker
+
+from config import DAYS_LIMIT
+from database import Base, Article, ArticleTag, split_tags, make_engine, _FTS_DDL, FTS_TABLE
+from feed_stream import parse_stream
+from keyword_matcher import KeywordMatcher
+from urls import url_key
+
+
+def _rand_word(rng, lo=3, hi=10):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(lo, hi)))
+
+
+def _rand_text(rng, vocab, words=80):
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def _timeit(fn, repeat=3):
+    """Best-of-N wall time in seconds."""
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+# ------------------ KEYWORD MATCHING ------------------
+
+def bench_keywords(sizes=(400, 5000, 50000), entries=300, seed=1):
+    """Naive `kw in text` scan (old get_matched_tags) vs the compiled KeywordMatcher."""
+    rng = random.Random(seed)
+    vocab = [_rand_word(rng) for _ in range(5000)]
+    texts = [_rand_text(rng, vocab).lower() for _ in range(entries)]
+
+    results = []
+    for n in sizes:
+        # Seed with phrases that occur in the texts so some keywords actually hit
+        keywords = dict.fromkeys(" ".join(t.split()[10:12]) for t in texts[:50])
+        while len(keywords) < n:
+            keywords[" ".join(rng.choice(vocab) for _ in range(rng.randint(1, 3)))] = None
+        keywords = list(keywords)
+
+        t0 = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        build_s = time.perf_counter() - t0
+
+        naive = lambda: [[kw for kw in keywords if kw in t] for t in texts]
+        compiled = lambda: [matcher.match(t) for t in texts]
+        assert naive() == compiled(), "matcher disagrees with substring scan"
+
+        naive_s = _timeit(naive)
+        compiled_s = _timeit(compiled)
+        results.append({
+            "keywords": len(keywords),
+            "entries": entries,
+            "naive_s": round(naive_s, 4),
+            "automaton_build_s": round(build_s, 4),
+            "automaton_match_s": round(compiled_s, 4),
+            "speedup": round(naive_s / compiled_s, 1) if compiled_s else None,
+        })
+    return {"section": "keywords", "results": results}
+
+
+# ------------------ TAG SEARCH ------------------
+
+def make_synthetic_db(path, n_articles, n_tags=400, seed=1, batch=20000):
+    """
+    Create a SQLite DB at `path` with n_articles synthetic articles (tags skewed so a
+    few tags are common and most are rare). Returns (engine, tag_vocab, words).
+    """
+    engine = create_engine("sqlite:///" + path)
+    Base.metadata.create_all(bind=engine)
+    tag_vocab, words = fill_synthetic_db(engine, n_articles, n_tags=n_tags, seed=seed, batch=batch)
+    return engine, tag_vocab, words
+
+
+def fill_synthetic_db(engine, n_articles, n_tags=400, seed=1, batch=20000):
+    """Insert the synthetic corpus into existing tables. Returns (tag_vocab, words), most common tags first."""
+    rng = random.Random(seed)
+    tag_vocab = [f"tag {i} {_rand_word(rng, 3, 6)}" for i in range(n_tags)]
+    weights = [1.0 / (i + 1) for i in range(n_tags)]
+    words = [_rand_word(rng) for _ in range(20000)]
+
+    now = datetime.now()
+    with engine.begin() as conn:
+        for start in range(0, n_articles, batch):
+            articles, tag_rows = [], []
+            for i in range(start + 1, min(n_articles, start + batch) + 1):
+                tags = sorted(set(rng.choices(tag_vocab, weights, k=rng.randint(1, 4))))
+                published = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+                tags_str = "," + ",".join(tags) + ","
+                articles.append({
+                    "id": i, "title": f"Article {i} " + " ".join(rng.choices(words, k=6)),
+                    "url": f"https://example.com/{i}", "url_key": url_key(f"https://example.com/{i}"),
+                    "published_date": published, "summary": " ".join(rng.choices(words, k=30)),
+                    "source": "bench", "tags": tags_str, "content": "",
+                })
+                tag_rows.extend({"article_id": i, "tag": t, "published_date": published} for t in split_tags(tags_str))
+            conn.execute(Article.__table__.insert(), articles)
+            conn.execute(ArticleTag.__table__.insert(), tag_rows)
+    return tag_vocab, words
+
+
+def _legacy_canon_tags_expr():
+    # What /articles/search used before article_tags existed
+    return func.lower(func.replace(func.replace(Article.tags, ', ', ','), ' ,', ','))
+
+
+def bench_tags(sizes=(10000, 100000, 1000000), page_size=25, repeat=3):
+    """LIKE scan over Article.tags vs article_tags index lookups, per corpus size."""
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            t0 = time.perf_counter()
+            engine, vocab, _ = make_synthetic_db(os.path.join(tmp, "bench.db"), n)
+            build_s = time.perf_counter() - t0
+            Session = sessionmaker(bind=engine)
+            common, rare = vocab[:3], vocab[-3:]
+
+            def like_search(tokens):
+                with Session() as s:
+                    q = s.query(Article).filter(or_(*[_legacy_canon_tags_expr().like(f"%,{t},%") for t in tokens]))
+                    q = q.order_by(Article.published_date.desc())
+                    return q.count(), q.limit(page_size).all()
+
+            def index_search(tokens):
+                with Session() as s:
+                    ids = s.query(ArticleTag.article_id).filter(ArticleTag.tag.in_(tokens))
+                    q = s.query(Article).filter(Article.id.in_(ids)).order_by(Article.published_date.desc())
+                    return q.count(), q.limit(page_size).all()
+
+            def like_has_articles():
+                with Session() as s:
+                    return [s.query(Article.id).filter(_legacy_canon_tags_expr().like(f"%,{t},%")).first() for t in vocab[:50]]
+
+            def index_has_articles():
+                with Session() as s:
+                    return [s.query(ArticleTag.article_id).filter(ArticleTag.tag == t).first() for t in vocab[:50]]
+
+            row = {"articles": n, "build_s": round(build_s, 2)}
+            for label, tokens in (("1_common_tag", common[:1]), ("3_common_tags", common), ("3_rare_tags", rare)):
+                like_s = _timeit(lambda: like_search(tokens), repeat)
+                index_s = _timeit(lambda: index_search(tokens), repeat)
+                row[f"search_{label}"] = {"like_s": round(like_s, 4), "index_s": round(index_s, 4),
+                                          "speedup": round(like_s / index_s, 1) if index_s else None}
+            like_s = _timeit(like_has_articles, repeat)
+            index_s = _timeit(index_has_articles, repeat)
+            row["has_articles_50_tags"] = {"like_s": round(like_s, 4), "index_s": round(index_s, 4),
+                                           "speedup": round(like_s / index_s, 1) if index_s else None}
+            engine.dispose()
+            results.append(row)
+    return {"section": "tags", "results": results}
+
+
+# ------------------ FULL-TEXT SEARCH ------------------
+
+def bench_fts(sizes=(10000, 100000, 1000000), page_size=25, repeat=5):
+    """Ranked + highlighted FTS5 queries (what /articles/search does with "q")."""
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine, vocab, words = make_synthetic_db(os.path.join(tmp, "bench.db"), n)
+            t0 = time.perf_counter()
+            with engine.begin() as conn:
+                for ddl in _FTS_DDL:
+                    conn.execute(text(ddl))
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            index_s = time.perf_counter() - t0
+
+            sql = text(f"""
+                SELECT a.id, bm25({FTS_TABLE}, 10.0, 3.0, 1.0) AS rank,
+                       highlight({FTS_TABLE}, 0, '<mark>', '</mark>'),
+                       snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '…', 24)
+                FROM articles a JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = a.id
+                WHERE {FTS_TABLE} MATCH :q
+                ORDER BY rank LIMIT :limit
+            """)
+            row = {"articles": n, "index_build_s": round(index_s, 2)}
+            queries = {
+                "one_term": f'"{words[0]}"',
+                "two_terms": f'"{words[1]}" "{words[2]}"',
+                "prefix": f'"{words[3][:3]}"*',
+            }
+            with engine.connect() as conn:
+                for label, q in queries.items():
+                    row[label + "_ms"] = round(1000 * _timeit(
+                        lambda: conn.execute(sql, {"q": q, "limit": page_size}).fetchall(), repeat), 2)
+            engine.dispose()
+            results.append(row)
+    return {"section": "fts", "results": results}
+
+
+# ------------------ FEED PARSING ------------------
+
+def make_rss_fixture(n_entries, content_kb=20, hours_apart=6, seed=1, now=None,
+                     keywords=None, match_every=3):
+    """
+    Synthetic newest-first RSS 2.0 document with a content:encoded body of roughly
+    content_kb KB per item, one item every `hours_apart` hours going back in time.
+    If `keywords` is given, every `match_every`-th title mentions one of them.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    vocab = [_rand_word(rng) for _ in range(2000)]
+    paragraph = "<p>" + _rand_text(rng, vocab, 150) + "</p>"
+    body = paragraph * max(1, (content_kb * 1024) // len(paragraph))
+    items = []
+    for i in range(n_entries):
+        title = _rand_text(rng, vocab, 8)
+        if keywords and i % match_every == 0:
+            title += " " + escape(rng.choice(keywords))
+        items.append(
+            "<item>"
+            f"<title>{title}</title>"
+            f"<link>https://example.com/articles/{seed}/{i}</link>"
+            f"<guid>https://example.com/articles/{seed}/{i}</guid>"
+            f"<description>{_rand_text(rng, vocab, 40)}</description>"
+            f"<pubDate>{format_datetime(now - timedelta(hours=i * hours_apart))}</pubDate>"
+            f"<content:encoded><![CDATA[{body}]]></content:encoded>"
+            "</item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+        "<channel><title>Benchmark feed</title><link>https://example.com/</link>"
+        + "".join(items) + "</channel></rss>"
+    ).encode("utf-8")
+
+
+def _measure(fn):
+    """(seconds, peak traced bytes) for one call of fn."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dt, peak
+
+
+def bench_stream(entry_counts=(50, 500), content_kb=20, chunk_size=64 * 1024):
+    """feedparser.parse on the whole body vs feed_stream with the DAYS_LIMIT cutoff."""
+    results = []
+    cutoff = datetime.now() - timedelta(days=DAYS_LIMIT)
+    for n in entry_counts:
+        xml = make_rss_fixture(n, content_kb=content_kb)
+        chunks = lambda: (xml[i:i + chunk_size] for i in range(0, len(xml), chunk_size))
+
+        fp_s, fp_peak = _measure(lambda: feedparser.parse(xml))
+        st_s, st_peak = _measure(lambda: parse_stream(chunks(), cutoff=cutoff))
+        streamed = parse_stream(chunks(), cutoff=cutoff)
+        results.append({
+            "entries": n,
+            "body_mb": round(len(xml) / 1e6, 2),
+            "feedparser_s": round(fp_s, 3),
+            "feedparser_peak_mb": round(fp_peak / 1e6, 2),
+            "stream_s": round(st_s, 3),
+            "stream_peak_mb": round(st_peak / 1e6, 2),
+            "stream_entries_read": len(streamed.entries),
+            "stream_stopped_early": streamed.truncated,
+        })
+    return {"section": "stream", "days_limit": DAYS_LIMIT, "results": results}
+
+
+# Edge cases for `parity`: markup that must be sanitized, content-only entries,
+# xhtml titles, relative links, guid/origLink links, namespaced descriptions, dates
+_PARITY_RSS = '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:media="http://search.yahoo.com/mrss/" xmlns:feedburner="http://rssnamespace.org/feedburner/ext/1.0"><channel><title>T</title><link>https://example.com/</link>{}</channel></rss>'
+_PARITY_ATOM = '<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>T</title>{}</feed>'
+PARITY_CASES = {
+    "script": _PARITY_RSS.format('<item><title>A</title><link>https://e.com/a</link><description><![CDATA[<p onclick="x()">Hi</p><script>alert(1)</script><img src="x" onerror="alert(2)"/>]]></description><pubDate>Mon, 06 Jan 2025 10:00:00 GMT</pubDate></item>'),
+    "content_only": _PARITY_RSS.format('<item><title>B</title><link>https://e.com/b</link><content:encoded><![CDATA[<p>Full <b>body</b> about fusion</p><iframe src="https://evil"></iframe>]]></content:encoded></item>'),
+    "content_then_desc": _PARITY_RSS.format('<item><title>B</title><link>https://e.com/b</link><content:encoded><![CDATA[<p>Full</p>]]></content:encoded><description>Short</description></item>'),
+    "desc_then_content": _PARITY_RSS.format('<item><title>B</title><link>https://e.com/b</link><description>Short</description><content:encoded><![CDATA[<p>Full</p>]]></content:encoded></item>'),
+    "plain_entities": _PARITY_RSS.format('<item><title>AT&amp;T &lt;b&gt;wins&lt;/b&gt;</title><link>https://e.com/c?a=1&amp;b=2</link><description>5 &lt; 6 &amp; so on</description></item>'),
+    "html_title": _PARITY_RSS.format('<item><title>&lt;em&gt;Big&lt;/em&gt; news</title><link>https://e.com/d</link><description>&lt;p&gt;x&lt;/p&gt;</description></item>'),
+    "relative": _PARITY_RSS.format('<item><title>R</title><link>/rel/path</link><description><![CDATA[<a href="/x">x</a> <img src="img.png">]]></description></item>'),
+    "guid_link": _PARITY_RSS.format('<item><title>G</title><guid>https://e.com/guid</guid><description>g</description></item>'),
+    "guid_not_permalink": _PARITY_RSS.format('<item><title>G</title><guid isPermaLink="false">abc123</guid><description>g</description></item>'),
+    "guid_nonurl": _PARITY_RSS.format('<item><title>G</title><guid>abc123</guid><description>g</description></item>'),
+    "origlink": _PARITY_RSS.format('<item><title>O</title><link>https://fb.com/x</link><feedburner:origLink>https://orig.com/x</feedburner:origLink><description>o</description></item>'),
+    "media_description": _PARITY_RSS.format('<item><title>M</title><link>https://e.com/m</link><media:description>media text</media:description></item>'),
+    "media_then_desc": _PARITY_RSS.format('<item><title>M</title><link>https://e.com/m</link><media:description>media text</media:description><description>real</description></item>'),
+    "dc_date": _PARITY_RSS.format('<item><title>D</title><link>https://e.com/dd</link><dc:date>2025-01-06T10:00:00Z</dc:date></item>'),
+    "cp1252": _PARITY_RSS.format('<item><title>quote \u0093x\u0094</title><link>https://e.com/q</link><description>café — ok</description></item>'),
+    "empty_desc": _PARITY_RSS.format('<item><title>E</title><link>https://e.com/e</link><description></description><content:encoded>body</content:encoded></item>'),
+    "whitespace": _PARITY_RSS.format('<item><title>\n  Spaced title \n</title><link>\n https://e.com/w \n</link><description>\n  s  \n</description></item>'),
+    "atom_xhtml": _PARITY_ATOM.format('<entry><title type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml">An <b>xhtml</b> title</div></title><link rel="alternate" href="https://e.com/x"/><id>tag:e.com,2025:1</id><updated>2025-01-06T10:00:00Z</updated><summary type="html">&lt;p&gt;sum&lt;/p&gt;&lt;script&gt;bad()&lt;/script&gt;</summary></entry>'),
+    "atom_content_only": _PARITY_ATOM.format('<entry><title>C</title><link href="https://e.com/ac"/><id>tag:e.com,2025:2</id><published>2025-01-06T10:00:00Z</published><content type="html">&lt;p onmouseover="x"&gt;Atom body&lt;/p&gt;</content></entry>'),
+    "atom_xhtml_content": _PARITY_ATOM.format('<entry><title type="html">&lt;i&gt;I&lt;/i&gt; title</title><link rel="alternate" type="text/html" href="https://e.com/a1"/><link rel="alternate" type="application/pdf" href="https://e.com/a1.pdf"/><link rel="enclosure" href="https://e.com/a1.mp3"/><id>tag:e.com,2025:3</id><content type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml"><p>One</p><p>Two <a href="/rel">r</a></p></div></content></entry>'),
+    "atom_two_divs": _PARITY_ATOM.format('<entry><title type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml"><div>a</div><div>b</div></div></title><link href="https://e.com/td"/><id>x</id></entry>'),
+    "atom_no_link": _PARITY_ATOM.format('<entry><title>N</title><id>https://e.com/idlink</id><summary>s</summary></entry>'),
+    "atom_text_looks_html": _PARITY_ATOM.format('<entry><title>A &lt;b&gt;bold&lt;/b&gt; claim</title><link href="https://e.com/tl"/><summary>x &amp;amp; y</summary></entry>'),
+    "atom_xml_base": _PARITY_ATOM.format('<entry xml:base="https://base.example/dir/"><title>B</title><link href="page.html"/><summary type="html">&lt;a href="rel.html"&gt;r&lt;/a&gt;</summary></entry>'),
+    "style_attr": _PARITY_RSS.format('<item><title>S</title><link>https://e.com/s</link><description><![CDATA[<p style="color:red;background:url(javascript:x)">styled</p><a href="javascript:alert(1)">js</a>]]></description></item>'),
+    "no_title": _PARITY_RSS.format('<item><link>https://e.com/nt</link><description>only desc</description></item>'),
+    "itunes": _PARITY_RSS.format('<item><title>P</title><link>https://e.com/p</link><itunes:summary xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">pod sum</itunes:summary></item>'),
+}
+
+PARITY_FIELDS = ("title", "link", "summary", "published_parsed", "updated_parsed", "feedburner_origlink")
+
+
+def bench_parity(fixture_feeds=5, entries=100):
+    """
+    feed_stream vs feedparser, field by field, on PARITY_CASES and generated fixture
+    feeds. Prints every mismatch; the section fails (exit status 1) if there is any.
+    """
+    feeds = {name: xml.encode("utf-8") for name, xml in PARITY_CASES.items()}
+    for i in range(fixture_feeds):
+        feeds[f"fixture_{i}"] = make_rss_fixture(entries, content_kb=2, seed=i + 1, keywords=["fusion", "AI"])
+
+    base = "https://feeds.example.com/rss"
+    mismatches = []
+    for name, body in feeds.items():
+        expected = feedparser.parse(body, response_headers={"content-location": base}).entries
+        actual = parse_stream([body], base=base).entries
+        if len(expected) != len(actual):
+            mismatches.append({"feed": name, "field": "entries", "feedparser": len(expected), "stream": len(actual)})
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            for field in PARITY_FIELDS:
+                if a.get(field) != b.get(field):
+                    mismatches.append({"feed": name, "entry": i, "field": field,
+                                       "feedparser": repr(a.get(field)), "stream": repr(b.get(field))})
+    return {"section": "parity", "feeds": len(feeds), "fields": list(PARITY_FIELDS), "mismatches": mismatches}
+
+
+# Labelled pairs from articles.db (ids of the tracked snapshot)
+NEARDUP_SAME_STORY = [(212, 218, 222)]  # one GlobalData article syndicated to its army/naval/air-force sites
+# Independent write-ups of the same event: not copies, so neither a hit nor a miss; reported only
+NEARDUP_SAME_EVENT = [(254, 312), (12, 46), (20, 50), (88, 263), (87, 115), (276, 334), (8, 59),
+                      (264, 316), (31, 53), (261, 364), (316, 325), (264, 325)]
+
+
+def _plain_words(summary):
+    return html.unescape(re.sub(r"<[^>]+>", " ", summary or "")).split()
+
+
+def _edit_title_word(rng, title, summary):
+    words = title.split()
+    words.insert(rng.randint(0, len(words)), rng.choice(["Exclusive:", "new", "report:", "officials", "says"]))
+    return " ".join(words), summary
+
+
+def _edit_summary_word(rng, title, summary):
+    words = _plain_words(summary)
+    words[rng.randrange(len(words))] = "changed"
+    return title, " ".join(words)
+
+
+# How syndicated copies of a real article differ from it
+NEARDUP_EDITS = {
+    "source_suffix": lambda rng, t, s: (t + " - Reuters", s),
+    "title_word_added": _edit_title_word,
+    "title_prefix": lambda rng, t, s: ("Breaking: " + t, s),
+    "summary_word_changed": _edit_summary_word,
+    "post_appeared_first": lambda rng, t, s: (
+        t, s + f'<p>The post <a href="https://news.example.com/p">{t}</a> appeared first on Example News.</p>'),
+    "summary_truncated_60pct": lambda rng, t, s: (
+        t, " ".join(_plain_words(s)[:max(5, len(_plain_words(s)) * 6 // 10)]) + " […]"),
+    "summary_truncated_30_words": lambda rng, t, s: (t, " ".join(_plain_words(s)[:30]) + "…"),
+    "html_rewrapped": lambda rng, t, s: (t, "<p>" + " ".join(_plain_words(s)) + "</p>"),
+    "suffix_truncated_read_more": lambda rng, t, s: (
+        t + " | Example", " ".join(_plain_words(s)[:max(5, len(_plain_words(s)) * 7 // 10)]) + " Continue reading…"),
+}
+
+
+def _simhash_v1(title, summary):
+    """near_dup.simhash before the tuning: title words x2 + bigrams of the whole summary."""
+    from near_dup import _SOURCE_SUFFIX_RE, _h64, _plain, _tokens
+    features = {}
+    for w in _tokens(_SOURCE_SUFFIX_RE.sub("", _plain(title))):
+        features["t:" + w] = features.get("t:" + w, 0) + 2
+    words = _tokens(_plain(summary))
+    for sh in [" ".join(words[i:i + 2]) for i in range(len(words) - 1)] or words:
+        features["s:" + sh] = features.get("s:" + sh, 0) + 1
+    vector = [0] * 64
+    for feature, weight in features.items():
+        h = _h64(feature)
+        for bit in range(64):
+            vector[bit] += weight if h >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(64) if vector[bit] > 0)
+
+
+def bench_neardup(db="articles.db", distances=range(3, 13), min_words=12, seed=7):
+    """
+    Near-duplicate recall vs false positives per max distance, for the current
+    near_dup.simhash and the previous features (v1). Positives: the labelled
+    same-story group plus every NEARDUP_EDITS copy of each article with at least
+    min_words of summary. Negatives: every other pair of real articles, which
+    includes the templated defenseworld.net filings that share most of their words.
+    """
+    from near_dup import hamming, simhash
+
+    with contextlib.closing(sqlite3.connect(f"file:{db}?mode=ro", uri=True)) as conn:
+        rows = conn.execute("SELECT id, title, summary FROM articles ORDER BY id").fetchall()
+    rng = random.Random(seed)
+    edited = [
+        (kind, (title, summary), edit(rng, title, summary))
+        for _, title, summary in rows if len(_plain_words(summary)) >= min_words
+        for kind, edit in NEARDUP_EDITS.items()
+    ]
+    same_story = {tuple(sorted(pair)) for group in NEARDUP_SAME_STORY for pair in itertools.combinations(group, 2)}
+    same_event = {tuple(sorted(pair)) for pair in NEARDUP_SAME_EVENT}
+
+    results = {}
+    for name, fn in (("current", simhash), ("v1", _simhash_v1)):
+        hashes = {aid: fn(title, summary) for aid, title, summary in rows}
+        edit_d = {}
+        for kind, original, copy in edited:
+            edit_d.setdefault(kind, []).append(hamming(fn(*original), fn(*copy)))
+        story_d = [hamming(hashes[a], hashes[b]) for a, b in sorted(same_story)]
+        negatives = sorted(
+            (hamming(hashes[a], hashes[b]), a, b)
+            for a, b in itertools.combinations(sorted(hashes), 2)
+            if (a, b) not in same_story and (a, b) not in same_event
+        )
+        results[name] = {
+            "by_max_distance": {
+                k: {
+                    "recall": {kind: round(sum(d <= k for d in ds) / len(ds), 3) for kind, ds in edit_d.items()},
+                    "same_story_pairs_found": sum(d <= k for d in story_d),
+                    "false_positive_pairs": sum(1 for d, _, _ in negatives if d <= k),
+                }
+                for k in distances
+            },
+            "closest_negatives": [{"distance": d, "ids": [a, b]} for d, a, b in negatives[:5]],
+            "same_event_distances": sorted(hamming(hashes[a], hashes[b]) for a, b in sorted(same_event)),
+        }
+    return {"section": "neardup", "articles": len(rows), "negative_pairs": len(negatives),
+            "same_story_pairs": len(same_story), "edited_copies": len(edited), "features": results}
+
+
+# ------------------ END-TO-END (scraper + API) ------------------
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serves server.feeds ({path: bytes}) with an ETag, answering 304 when it matches
+    (paths ending in .html as text/html). server.errors ({path: status}) answers with
+    that status and "Retry-After: 3600" instead. server.done records, per Host header,
+    when its latest response finished (time.perf_counter()). server.delays ({path: seconds}) holds a response back before the headers, and
+    server.trickle ({path: seconds}) sends the body one CHUNK_SIZE piece per interval.
+    server.peak records the most requests in flight at once, per Host header and "*".
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        host = self.headers.get("Host", "").rsplit(":", 1)[0]
+        with self.server.lock:
+            for key in (host, "*"):
+                self.server.active[key] = self.server.active.get(key, 0) + 1
+                self.server.peak[key] = max(self.server.peak.get(key, 0), self.server.active[key])
+        try:
+            time.sleep(self.server.delays.get(self.path, 0))
+            self._respond()
+        finally:
+            with self.server.lock:
+                for key in (host, "*"):
+                    self.server.active[key] -= 1
+                self.server.done[host] = time.perf_counter()
+
+    def _respond(self):
+        status = self.server.errors.get(self.path)
+        if status is not None:
+            self.send_response(status)
+            self.send_header("Retry-After", "3600")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.server.feeds.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html" if self.path.endswith(".html") else "application/rss+xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        interval = self.server.trickle.get(self.path)
+        if interval is None:
+            self.wfile.write(body)
+            return
+        from fetcher import CHUNK_SIZE
+        for i in range(0, len(body), CHUNK_SIZE):
+            self.wfile.write(body[i:i + CHUNK_SIZE])
+            self.wfile.flush()
+            time.sleep(interval)
+
+
+def serve_fixtures(feeds, delays=None, trickle=None, errors=None):
+    """Start a local HTTP server for {path: bytes} (see _FixtureHandler). Returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+    server.daemon_threads = True
+    server.feeds = feeds
+    server.delays = delays or {}
+    server.trickle = trickle or {}
+    server.errors = errors or {}
+    server.lock = threading.Lock()
+    server.active, server.peak, server.done = {}, {}, {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _reset_app_db(n_articles, seed=1):
+    """Recreate the scratch app DB with n_articles synthetic articles. Returns (tag_vocab, words)."""
+    import database
+    database.drop_fts()
+    database.Base.metadata.drop_all(bind=database.engine)
+    database.Base.metadata.create_all(bind=database.engine)
+    vocab, words = fill_synthetic_db(database.engine, n_articles, seed=seed) if n_articles else ([], [])
+    if database.engine.dialect.name == "postgresql" and n_articles:
+        # Synthetic rows carry explicit ids; move the serial past them
+        with database.engine.begin() as conn:
+            conn.execute(text("SELECT setval(pg_get_serial_sequence('articles', 'id'), (SELECT max(id) FROM articles))"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()  # FTS index, cache row, keyword seed
+    return vocab, words
+
+
+def _run_summary(run, wall_s):
+    from scrape_metrics import FEED_METRICS
+    statuses = {}
+    for f in run.feeds.values():
+        statuses[f.status] = statuses.get(f.status, 0) + 1
+    summary = {"wall_s": round(wall_s, 3), "new_articles": run.new_articles, "statuses": statuses}
+    for name, _ in FEED_METRICS:
+        total = sum(getattr(f, name) for f in run.feeds.values())
+        summary[name] = round(total, 4) if isinstance(total, float) else total
+    return summary
+
+
+def bench_fetch(delay=1.0, workers=4, per_host=2, timeout=1.0):
+    """
+    fetcher.fetch_feeds against the local server with artificial delays. "127.0.0.1"
+    and "localhost" are two hosts to the fetcher. Checks, listed under "failures"
+    (exit status 1) when they don't hold:
+      hosts   - 6 slow feeds on one host and 2 fast ones on the other: the fast
+                host's feeds don't wait behind the slow host's queue, and no host
+                ever sees more than per_host requests at once
+      workers - 2 * workers slow feeds on one host with per_host = workers: they
+                run workers at a time, never more
+      timeout - a feed whose body trickles in past `timeout` fails with a timeout
+                while a healthy feed fetched alongside it succeeds
+    """
+    from fetcher import STATUS_ERROR, STATUS_OK, fetch_feeds
+
+    body = make_rss_fixture(5, content_kb=1)
+    big = make_rss_fixture(60, content_kb=10)  # several CHUNK_SIZE pieces
+    feeds = {f"/slow{i}": body for i in range(2 * workers)}
+    feeds.update({"/fast0": body, "/fast1": body, "/trickle": big})
+    server, base = serve_fixtures(feeds, delays={f"/slow{i}": delay for i in range(2 * workers)},
+                                  trickle={"/trickle": timeout})
+    other = base.replace("127.0.0.1", "localhost")
+    failures = []
+
+    def run(urls, **kwargs):
+        server.peak.clear()
+        started = time.perf_counter()
+        done = {}
+        for result in fetch_feeds(urls, timeout=kwargs.pop("timeout", 30), **kwargs):
+            done[result.feed_url] = (round(time.perf_counter() - started, 3), result)
+        return done, round(time.perf_counter() - started, 3), dict(server.peak)
+
+    try:
+        slow = [f"{base}/slow{i}" for i in range(6)]
+        fast = [f"{other}/fast0", f"{other}/fast1"]
+        done, wall, peak = run(slow + fast, workers=workers, per_host=per_host)
+        fast_s = max(done[u][0] for u in fast)
+        hosts = {"wall_s": wall, "fast_host_done_s": fast_s, "peak_per_host": peak,
+                 "expected_wall_s": 3 * delay}
+        if fast_s > delay / 2:
+            failures.append(f"hosts: fast host finished at {fast_s}s, behind the slow host's queue")
+        if max(peak.get("127.0.0.1", 0), peak.get("localhost", 0)) > per_host:
+            failures.append(f"hosts: more than per_host={per_host} requests in flight on one host: {peak}")
+        if any(r.status != STATUS_OK for _, r in done.values()):
+            failures.append("hosts: a feed failed")
+
+        slow = [f"{base}/slow{i}" for i in range(2 * workers)]
+        done, wall, peak = run(slow, workers=workers, per_host=workers)
+        concurrency = {"wall_s": wall, "peak_in_flight": peak.get("*"), "expected_wall_s": 2 * delay}
+        if peak.get("*") != workers:
+            failures.append(f"workers: peak {peak.get('*')} requests in flight, expected {workers}")
+        if not 2 * delay <= wall < 3 * delay:
+            failures.append(f"workers: {len(slow)} feeds took {wall}s, expected about {2 * delay}s")
+
+        done, wall, _ = run([f"{base}/trickle", f"{other}/fast0"], workers=workers, per_host=per_host,
+                            timeout=timeout)
+        took, trickled = done[f"{base}/trickle"]
+        timeouts = {"trickle_s": took, "trickle_error": str(trickled.error), "timeout_s": timeout}
+        if trickled.status != STATUS_ERROR or not isinstance(trickled.error, TimeoutError):
+            failures.append(f"timeout: trickling feed ended {trickled.status} ({trickled.error!r})")
+        elif took > 3 * timeout:
+            failures.append(f"timeout: trickling feed gave up after {took}s with timeout={timeout}s")
+        if done[f"{other}/fast0"][1].status != STATUS_OK:
+            failures.append("timeout: the healthy feed next to it failed")
+    finally:
+        server.shutdown()
+
+    return {"section": "fetch", "delay_s": delay, "workers": workers, "per_host": per_host,
+            "hosts": hosts, "workers_run": concurrency, "timeout": timeouts, "failures": failures}
+
+
+def bench_content(busy_pages=40, idle_pages=4, workers=8, interval=0.2, retry_after_cap=0.5):
+    """
+    content_fetcher.fetch_missing_content against local article pages. "127.0.0.1"
+    and "localhost" are two domains to it. Checks, listed under "failures" (exit
+    status 1) when they don't hold:
+      domains     - `busy_pages` pages on one domain and `idle_pages` on the other (the
+                    idle domain's rows are the oldest, so they come last): the idle
+                    domain finishes in about idle_pages * interval, not behind the
+                    busy domain's queue, and the busy one is still rate limited
+      retry_after - a page answering 503 with "Retry-After: 3600" is given up after
+                    CONTENT_FETCH_RETRIES waits of at most the (lowered) cap
+      attempts    - a page that keeps failing is retried on later runs, then stored
+                    as NULL after CONTENT_FETCH_MAX_ATTEMPTS
+    """
+    import content_fetcher
+    from database import SessionLocal, Article
+
+    page = b"<html><body><article>" + b"<p>" + b"Article body text for the content benchmark. " * 4 + b"</p>" * 3 \
+        + b"</article></body></html>"
+    pages = {f"/page/{i}.html": page for i in range(busy_pages + idle_pages)}
+    server, base = serve_fixtures(pages, errors={"/unavailable.html": 503})
+    other = base.replace("127.0.0.1", "localhost")
+    failures = []
+
+    def reset(urls):
+        _reset_app_db(0)
+        with SessionLocal() as s:
+            s.add_all(Article(title=f"Article {i}", url=url, content="") for i, url in enumerate(urls))
+            s.commit()
+
+    def content_of(url):
+        with SessionLocal() as s:
+            return s.query(Article.content, Article.content_attempts).filter(Article.url == url).one()
+
+    try:
+        idle = [f"{other}/page/{i}.html" for i in range(idle_pages)]
+        busy = [f"{base}/page/{i}.html" for i in range(idle_pages, idle_pages + busy_pages)]
+        reset(idle + busy)
+        started = time.perf_counter()
+        stored = content_fetcher.fetch_missing_content(workers=workers, processes=0, domain_interval=interval)
+        wall = time.perf_counter() - started
+        idle_s = round(server.done["localhost"] - started, 3)
+        domains = {"wall_s": round(wall, 3), "idle_domain_done_s": idle_s, "stored": stored,
+                   "expected_idle_s": round(idle_pages * interval, 3),
+                   "expected_wall_s": round(busy_pages * interval, 3)}
+        if stored != busy_pages + idle_pages:
+            failures.append(f"domains: stored {stored} of {busy_pages + idle_pages} pages")
+        if idle_s > idle_pages * interval + 0.5:
+            failures.append(f"domains: idle domain finished at {idle_s}s, behind the busy domain's queue")
+        if wall < (busy_pages - 1) * interval:
+            failures.append(f"domains: {busy_pages} pages on one domain took {wall:.2f}s, under the rate limit")
+
+        saved_cap = content_fetcher.CONTENT_FETCH_MAX_RETRY_AFTER
+        content_fetcher.CONTENT_FETCH_MAX_RETRY_AFTER = retry_after_cap
+        try:
+            reset([f"{base}/unavailable.html"])
+            started = time.perf_counter()
+            content_fetcher.fetch_missing_content(workers=workers, processes=0, domain_interval=interval)
+            took = round(time.perf_counter() - started, 3)
+        finally:
+            content_fetcher.CONTENT_FETCH_MAX_RETRY_AFTER = saved_cap
+        limit = content_fetcher.CONTENT_FETCH_RETRIES * retry_after_cap + 2
+        retry_after = {"took_s": took, "cap_s": retry_after_cap, "retries": content_fetcher.CONTENT_FETCH_RETRIES}
+        if took > limit:
+            failures.append(f"retry_after: a 503 with Retry-After: 3600 held the run for {took}s (limit {limit}s)")
+
+        saved_retries = content_fetcher.CONTENT_FETCH_RETRIES
+        content_fetcher.CONTENT_FETCH_RETRIES = 0
+        try:
+            reset([f"{base}/unavailable.html"])
+            runs = []
+            for _ in range(content_fetcher.CONTENT_FETCH_MAX_ATTEMPTS + 1):
+                content_fetcher.fetch_missing_content(workers=workers, processes=0)
+                runs.append(content_of(f"{base}/unavailable.html"))
+                with SessionLocal() as s:  # skip the wait before the next attempt
+                    s.query(Article).update({Article.content_retry_at: None})
+                    s.commit()
+        finally:
+            content_fetcher.CONTENT_FETCH_RETRIES = saved_retries
+        attempts = {"runs": [{"content": c, "attempts": a} for c, a in runs],
+                    "max_attempts": content_fetcher.CONTENT_FETCH_MAX_ATTEMPTS}
+        given_up = [i for i, (c, _) in enumerate(runs) if c is None]
+        if given_up != list(range(content_fetcher.CONTENT_FETCH_MAX_ATTEMPTS - 1, len(runs))):
+            failures.append(f"attempts: expected NULL from run {content_fetcher.CONTENT_FETCH_MAX_ATTEMPTS}, "
+                            f"got {runs}")
+    finally:
+        server.shutdown()
+
+    return {"section": "content", "workers": workers, "domain_interval_s": interval, "domains": domains,
+            "retry_after": retry_after, "attempts": attempts, "failures": failures}
+
+
+def bench_scrape(feed_counts=(10, 50), entries=100, content_kb=5):
+    """
+    scrape_articles() against local fixture feeds: a cold run into an empty DB, then
+    a warm run where every feed answers 304. Stage times are summed over feeds
+    (fetches overlap, so they can exceed wall time).
+    """
+    from database import SessionLocal
+    from scraper import load_keywords, scrape_articles
+
+    results = []
+    for n in feed_counts:
+        _reset_app_db(0)
+        with SessionLocal() as s:
+            keywords = load_keywords(s)
+        fixtures = {
+            f"/feed/{i}.xml": make_rss_fixture(entries, content_kb=content_kb, seed=i + 1, keywords=keywords)
+            for i in range(n)
+        }
+        server, base = serve_fixtures(fixtures)
+        urls = [base + path for path in fixtures]
+        row = {"feeds": n, "entries_per_feed": entries,
+               "body_mb_total": round(sum(len(b) for b in fixtures.values()) / 1e6, 2)}
+        try:
+            for label in ("cold", "warm"):
+                t0 = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run = scrape_articles(feed_urls=urls)
+                row[label] = _run_summary(run, time.perf_counter() - t0)
+        finally:
+            server.shutdown()
+            server.server_close()
+        results.append(row)
+    return {"section": "scrape", "results": results}
+
+
+def bench_matching(extra_keywords=(0, 1000, 10000), feeds=10, entries=100, repeat=3, seed=1):
+    """scraper.get_matched_tags over parsed fixture entries, with the seeded keywords plus N synthetic ones."""
+    from config import KEYWORDS
+    from scraper import build_keyword_matcher, get_matched_tags
+
+    rng = random.Random(seed)
+    base = list(dict.fromkeys(k.strip().lower() for k in KEYWORDS if k and k.strip()))
+    parsed = []
+    for i in range(feeds):
+        xml = make_rss_fixture(entries, content_kb=1, seed=i + 1, keywords=base)
+        parsed.extend(parse_stream([xml]).entries)
+
+    results = []
+    for extra in extra_keywords:
+        keywords = list(base)
+        while len(keywords) < len(base) + extra:
+            keywords.append(" ".join(_rand_word(rng) for _ in range(rng.randint(1, 3))))
+        t0 = time.perf_counter()
+        matcher = build_keyword_matcher(keywords)
+        build_s = time.perf_counter() - t0
+        match_s = _timeit(lambda: [get_matched_tags(e, matcher) for e in parsed], repeat)
+        results.append({
+            "keywords": len(keywords),
+            "entries": len(parsed),
+            "build_ms": round(1000 * build_s, 2),
+            "match_ms": round(1000 * match_s, 2),
+            "per_entry_us": round(1e6 * match_s / len(parsed), 2),
+            "matched_entries": sum(1 for e in parsed if get_matched_tags(e, matcher)),
+        })
+    return {"section": "matching", "results": results}
+
+
+def bench_api(sizes=(10000, 100000), tag_counts=(0, 1, 3, 10), pages=(1, 10, 100), page_size=25, repeat=5):
+    """
+    /articles/search (offset pages, cursor pages at the same depth) and
+    /tags?include_has_articles=1 through the Flask test client, response cache off.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+    client = app_module.app.test_client()
+    app_module.TAGS_STORE_PATH = os.path.join(_SCRATCH_DIR, "tags.json")
+
+    def call(method, url, **kwargs):
+        resp = client.open(url, method=method, **kwargs)
+        assert resp.status_code == 200, (url, resp.status_code, resp.get_data(as_text=True)[:200])
+        return resp
+
+    results = []
+    for n in sizes:
+        vocab, _ = _reset_app_db(n)
+        row = {"articles": n, "page_size": page_size, "search": [], "tags": {}}
+
+        for k in tag_counts:
+            tags = vocab[:k]  # most common tags first
+            for page in pages:
+                body = {"tags": tags, "page": page, "page_size": page_size}
+                ms = 1000 * _timeit(lambda: call("POST", "/articles/search", json=body), repeat)
+                row["search"].append({"mode": "offset", "tags": k, "page": page, "ms": round(ms, 2)})
+
+            # Walk the cursor chain to each depth, then time fetching that page
+            cursor, depth = None, 1
+            for page in sorted(pages):
+                while depth < page and (depth == 1 or cursor):
+                    resp = call("POST", "/articles/search", json={"tags": tags, "cursor": cursor, "page_size": page_size})
+                    cursor = resp.get_json()["next_cursor"]
+                    depth += 1
+                if page > 1 and not cursor:
+                    break
+                body = {"tags": tags, "cursor": cursor, "page_size": page_size}
+                ms = 1000 * _timeit(lambda: call("POST", "/articles/search", json=body), repeat)
+                row["search"].append({"mode": "cursor", "tags": k, "page": page, "ms": round(ms, 2)})
+
+        # /tags: aggregated from Article.tags (no tags.json), then with a canonical list
+        if os.path.exists(app_module.TAGS_STORE_PATH):
+            os.remove(app_module.TAGS_STORE_PATH)
+        for label, url in (("aggregated_has_articles", "/tags?include_has_articles=1"),
+                           ("aggregated_counts", "/tags?include_has_articles=1&include_counts=1")):
+            row["tags"][label + "_ms"] = round(1000 * _timeit(lambda: call("GET", url), repeat), 2)
+        app_module._save_canonical_tags(vocab)
+        for label, url in (("canonical_has_articles", "/tags?include_has_articles=1"),
+                           ("canonical_counts", "/tags?include_has_articles=1&include_counts=1")):
+            row["tags"][label + "_ms"] = round(1000 * _timeit(lambda: call("GET", url), repeat), 2)
+        row["tags"]["tag_count"] = len(vocab)
+        results.append(row)
+    return {"section": "api", "results": results}
+
+
+def bench_export(sizes=(10000, 100000), page_size=500):
+    """
+    Pulling the whole corpus: /articles/search offset pages of `page_size` (what the
+    analytics sync did) vs one streamed GET /articles/export, plain and gzip.
+    Time and peak traced memory per full pull; the stream is consumed chunk by chunk.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+    client = app_module.app.test_client()
+
+    def paged():
+        page, rows = 1, 0
+        while True:
+            resp = client.post("/articles/search", json={"page": page, "page_size": page_size})
+            assert resp.status_code == 200, resp.status_code
+            n = len(resp.get_json()["articles"])
+            rows += n
+            if n < page_size:
+                return rows
+            page += 1
+
+    def streamed(headers):
+        resp = client.get("/articles/export", headers=headers, buffered=False)
+        assert resp.status_code == 200, resp.status_code
+        size = 0
+        for chunk in resp.response:
+            size += len(chunk)
+        resp.close()
+        return size
+
+    results = []
+    for n in sizes:
+        _reset_app_db(n)
+        row = {"articles": n, "page_size": page_size}
+        sizes_out = {}
+        for label, fn in (("paged_search", paged),
+                          ("export", lambda: sizes_out.__setitem__("export", streamed({}))),
+                          ("export_gzip", lambda: sizes_out.__setitem__("export_gzip",
+                                                                        streamed({"Accept-Encoding": "gzip"})))):
+            t0 = time.perf_counter()
+            fn()
+            dt = time.perf_counter() - t0
+            _, peak = _measure(fn)  # separate run: tracemalloc slows allocation-heavy code
+            row[label] = {"s": round(dt, 3), "peak_kb": round(peak / 1024)}
+        row["export"]["bytes"] = sizes_out["export"]
+        row["export_gzip"]["bytes"] = sizes_out["export_gzip"]
+        row["speedup"] = round(row["paged_search"]["s"] / max(row["export"]["s"], 1e-9), 1)
+        results.append(row)
+    return {"section": "export", "results": results}
+
+
+# ------------------ READ/WRITE CONCURRENCY ------------------
+
+def bench_concurrency(n_articles=20000, write_rows=20000, readers=4, content_kb=2, chunk=500, seed=1):
+    """
+    Reader latency while a scrape-sized write transaction runs, per SQLite profile.
+    The writer inserts `write_rows` articles in one transaction (like scrape_articles)
+    while `readers` threads run the newest-first /articles/search query.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    rng = random.Random(seed)
+    body = _rand_text(rng, [_rand_word(rng) for _ in range(500)], content_kb * 1024 // 7)
+
+    results = []
+    for profile in ("default", "tuned"):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_engine("sqlite:///" + os.path.join(tmp, "bench.db"), profile=profile)
+            Base.metadata.create_all(bind=engine)
+            fill_synthetic_db(engine, n_articles, seed=seed)
+            with engine.connect() as conn:
+                journal = conn.execute(text("PRAGMA journal_mode")).scalar()
+
+            writing = threading.Event()
+            done = threading.Event()
+            latencies, errors = [], []
+
+            def writer():
+                now = datetime.now()
+                t0 = time.perf_counter()
+                with engine.begin() as conn:
+                    writing.set()
+                    for start in range(0, write_rows, chunk):
+                        conn.execute(Article.__table__.insert(), [
+                            {"title": f"new {i}", "url": f"https://example.com/new/{i}",
+                             "url_key": url_key(f"https://example.com/new/{i}"), "published_date": now,
+                             "summary": "s", "source": "bench", "tags": ",tag 0,", "content": body}
+                            for i in range(start, min(write_rows, start + chunk))
+                        ])
+                        time.sleep(0.005)  # per-feed parsing/matching between writes
+                done.set()
+                return time.perf_counter() - t0
+
+            query = text("SELECT id, title FROM articles ORDER BY published_date DESC, id DESC LIMIT 25")
+
+            def reader():
+                writing.wait()
+                while not done.is_set():
+                    t0 = time.perf_counter()
+                    try:
+                        with engine.connect() as conn:
+                            conn.execute(query).fetchall()
+                        latencies.append(time.perf_counter() - t0)
+                    except Exception as e:
+                        errors.append(type(e).__name__)
+
+            with ThreadPoolExecutor(max_workers=readers + 1) as pool:
+                read_futs = [pool.submit(reader) for _ in range(readers)]
+                writer_s = pool.submit(writer).result()
+                for f in read_futs:
+                    f.result()
+            engine.dispose()
+
+        latencies.sort()
+        pct = lambda p: round(1000 * latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 2) if latencies else None
+        results.append({
+            "profile": profile,
+            "journal_mode": journal,
+            "writer_s": round(writer_s, 3),
+            "reads": len(latencies),
+            "read_errors": len(errors),
+            "read_p50_ms": pct(50),
+            "read_p99_ms": pct(99),
+            "read_max_ms": round(1000 * latencies[-1], 2) if latencies else None,
+            "reads_over_100ms": sum(1 for x in latencies if x > 0.1),
+        })
+    return {"section": "concurrency", "articles": n_articles, "write_rows": write_rows,
+            "readers": readers, "results": results}
+
+
+def bench_workers(worker_counts=(1, 4), feeds=40, entries=100, content_kb=5, lease_seconds=4):
+    """
+    `python worker.py --queue --exit-when-idle` processes sharing the scratch DB and
+    local fixture feeds. Feed 0 starts out leased by a worker that is already dead,
+    so it is only scraped once that lease expires. Checks that every feed was
+    scraped exactly once (scrape_runs), every lease was released, and the same
+    articles were stored whatever the worker count; anything else is listed
+    under "failures" (tests/test_work_queue.py runs the same checks).
+    """
+    from database import SessionLocal, Article, FeedWork, ScrapeRun
+    from scraper import load_keywords
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    failures = []
+    for n in worker_counts:
+        _reset_app_db(0)
+        with SessionLocal() as s:
+            keywords = load_keywords(s)
+        fixtures = {
+            f"/feed/{i}.xml": make_rss_fixture(entries, content_kb=content_kb, seed=i + 1, keywords=keywords)
+            for i in range(feeds)
+        }
+        server, base = serve_fixtures(fixtures)
+        urls = [base + path for path in fixtures]
+        now = datetime.now()
+        with SessionLocal() as s:
+            s.add(FeedWork(key=urls[0], available_at=now, attempts=0, lease_owner="dead-worker",
+                           lease_expires_at=now + timedelta(seconds=lease_seconds)))
+            s.commit()
+
+        env = dict(os.environ, RSS_FEEDS=",".join(urls), SCHEDULER_MODE="off", CONTENT_FETCH="0",
+                   QUEUE_CLAIM_BATCH="2", QUEUE_IDLE_SECONDS="0.2",
+                   QUEUE_LEASE_SECONDS=str(lease_seconds), QUEUE_HEARTBEAT_SECONDS="1")
+        try:
+            t0 = time.perf_counter()
+            procs = [
+                subprocess.Popen([sys.executable, "worker.py", "--queue", "--exit-when-idle"], cwd=repo, env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+                for _ in range(n)
+            ]
+            errors = [p.communicate(timeout=600)[1] for p in procs]
+            wall = time.perf_counter() - t0
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        with SessionLocal() as s:
+            scraped = {}
+            for (stats,) in s.query(ScrapeRun.stats):
+                for f in json.loads(stats or "[]"):
+                    scraped[f["feed_url"]] = scraped.get(f["feed_url"], 0) + 1
+            rows = {r.key: r for r in s.query(FeedWork)}
+            articles = s.query(func.count(Article.id)).scalar()
+            dead = rows.get(urls[0])
+            results.append({
+                "workers": n,
+                "feeds": feeds,
+                "wall_s": round(wall, 3),
+                "articles": articles,
+                "feeds_scraped_once": sum(1 for u in urls if scraped.get(u) == 1),
+                "feeds_scraped_twice_or_more": sum(1 for u in urls if scraped.get(u, 0) > 1),
+                "leases_outstanding": sum(1 for r in rows.values() if r.lease_owner),
+                "batches_per_worker": _count_by(r.last_owner for r in rows.values()),
+                "dead_lease_recovered": bool(dead and dead.completed_at and dead.last_owner != "dead-worker"),
+                "worker_exit_codes": [p.returncode for p in procs],
+                "worker_errors": [e.strip().splitlines()[-1] for e in errors if e.strip()],
+            })
+        r = results[-1]
+        if r["feeds_scraped_once"] != feeds:
+            failures.append(f"{n} workers: {feeds - r['feeds_scraped_once']} feed(s) not scraped exactly once")
+        if r["leases_outstanding"]:
+            failures.append(f"{n} workers: {r['leases_outstanding']} lease(s) still held after the workers exited")
+        if not r["dead_lease_recovered"]:
+            failures.append(f"{n} workers: the dead worker's lease was never taken over")
+        if any(r["worker_exit_codes"]) or r["worker_errors"]:
+            failures.append(f"{n} workers: exit codes {r['worker_exit_codes']}, errors {r['worker_errors']}")
+    if len({r["articles"] for r in results}) > 1:
+        failures.append(f"articles stored differ by worker count: {[r['articles'] for r in results]}")
+    return {"section": "workers", "results": results, "failures": failures}
+
+
+def _count_by(values):
+    counts = {}
+    for v in values:
+        counts[v] = counts.get(v, 0) + 1
+    return sorted(counts.values(), reverse=True)
+
+
+def bench_suite():
+    """Small end-to-end run of every section that exercises the app code."""
+    return {
+        "section": "suite",
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "results": [
+            bench_scrape(feed_counts=(10,), entries=100),
+            bench_matching(extra_keywords=(0, 1000)),
+            bench_api(sizes=(10000,), tag_counts=(0, 1, 3), pages=(1, 10)),
+        ],
+    }
+
+
+def _ints(value):
+    return [int(x) for x in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="section", required=True)
+
+    p = sub.add_parser("keywords", help="keyword matching: substring scan vs Aho-Corasick")
+    p.add_argument("--sizes", default="400,5000,50000")
+    p.add_argument("--entries", type=int, default=300)
+
+    p = sub.add_parser("tags", help="tag search / has_articles: LIKE scan vs article_tags index")
+    p.add_argument("--sizes", default="10000,100000,1000000")
+
+    p = sub.add_parser("stream", help="feed parsing: feedparser vs incremental parser with cutoff")
+    p.add_argument("--entries", default="50,500")
+    p.add_argument("--content-kb", type=int, default=20)
+
+    p = sub.add_parser("parity", help="feed_stream vs feedparser entries, field by field")
+    p.add_argument("--fixture-feeds", type=int, default=5)
+
+    p = sub.add_parser("neardup", help="near-duplicate SimHash: recall on edited copies vs false positives")
+    p.add_argument("--db", default="articles.db")
+    p.add_argument("--distances", default="3,4,5,6,7,8,9,10,11,12")
+
+    p = sub.add_parser("fts", help="full-text search latency over a synthetic corpus")
+    p.add_argument("--sizes", default="10000,100000,1000000")
+
+    p = sub.add_parser("fetch", help="fetch_feeds against delayed local feeds: per-host limit, workers, timeout")
+    p.add_argument("--delay", type=float, default=1.0)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--per-host", type=int, default=2)
+    p.add_argument("--timeout", type=float, default=1.0)
+
+    p = sub.add_parser("scrape", help="scrape_articles against local fixture feeds (cold and 304 runs)")
+    p.add_argument("--feeds", default="10,50")
+    p.add_argument("--entries", type=int, default=100)
+    p.add_argument("--content-kb", type=int, default=5)
+
+    p = sub.add_parser("matching", help="get_matched_tags over parsed fixture entries")
+    p.add_argument("--extra-keywords", default="0,1000,10000")
+
+    p = sub.add_parser("api", help="/articles/search and /tags through the Flask test client")
+    p.add_argument("--sizes", default="10000,100000")
+    p.add_argument("--tag-counts", default="0,1,3,10")
+    p.add_argument("--pages", default="1,10,100")
+    p.add_argument("--page-size", type=int, default=25)
+
+    p = sub.add_parser("export", help="paged /articles/search vs streamed /articles/export")
+    p.add_argument("--sizes", default="10000,100000")
+    p.add_argument("--page-size", type=int, default=500)
+
+    p = sub.add_parser("suite", help="scrape + matching + api at small sizes")
+
+    p = sub.add_parser("concurrency", help="reader latency during a long write, per SQLite profile")
+    p.add_argument("--articles", type=int, default=20000)
+    p.add_argument("--write-rows", type=int, default=20000)
+    p.add_argument("--readers", type=int, default=4)
+
+    p = sub.add_parser("content", help="article body fetch: per-domain dispatch, Retry-After cap, attempt limit")
+    p.add_argument("--busy-pages", type=int, default=40)
+    p.add_argument("--idle-pages", type=int, default=4)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--interval", type=float, default=0.2)
+
+    p = sub.add_parser("workers", help="several `worker.py --queue` processes sharing one DB")
+    p.add_argument("--workers", default="1,4")
+    p.add_argument("--feeds", type=int, default=40)
+    p.add_argument("--entries", type=int, default=100)
+
+    for p in sub.choices.values():
+        p.add_argument("--out", help="also write the JSON to this file")
+    args = parser.parse_args()
+    if args.section == "keywords":
+        out = bench_keywords(sizes=[int(x) for x in args.sizes.split(",")], entries=args.entries)
+    elif args.section == "tags":
+        out = bench_tags(sizes=[int(x) for x in args.sizes.split(",")])
+    elif args.section == "fts":
+        out = bench_fts(sizes=[int(x) for x in args.sizes.split(",")])
+    elif args.section == "stream":
+        out = bench_stream(entry_counts=[int(x) for x in args.entries.split(",")], content_kb=args.content_kb)
+    elif args.section == "parity":
+        out = bench_parity(fixture_feeds=args.fixture_feeds)
+    elif args.section == "neardup":
+        out = bench_neardup(db=args.db, distances=_ints(args.distances))
+    elif args.section == "fetch":
+        out = bench_fetch(delay=args.delay, workers=args.workers, per_host=args.per_host, timeout=args.timeout)
+    elif args.section == "content":
+        out = bench_content(busy_pages=args.busy_pages, idle_pages=args.idle_pages, workers=args.workers,
+                            interval=args.interval)
+    elif args.section == "scrape":
+        out = bench_scrape(feed_counts=_ints(args.feeds), entries=args.entries, content_kb=args.content_kb)
+    elif args.section == "matching":
+        out = bench_matching(extra_keywords=_ints(args.extra_keywords))
+    elif args.section == "export":
+        out = bench_export(sizes=_ints(args.sizes), page_size=args.page_size)
+    elif args.section == "api":
+        out = bench_api(sizes=_ints(args.sizes), tag_counts=_ints(args.tag_counts), pages=_ints(args.pages),
+                        page_size=args.page_size)
+    elif args.section == "suite":
+        out = bench_suite()
+    elif args.section == "concurrency":
+        out = bench_concurrency(n_articles=args.articles, write_rows=args.write_rows, readers=args.readers)
+    elif args.section == "workers":
+        out = bench_workers(worker_counts=_ints(args.workers), feeds=args.feeds, entries=args.entries)
+    doc = json.dumps(out, indent=2)
+    print(doc)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(doc + "\n")
+    if out.get("mismatches") or out.get("failures"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# content_fetcher.py
+"""
+Post-scrape stage: download article pages and store their extracted text in
+Article.content.
+
+- Downloads run on a bounded thread pool over one pooled requests.Session with
+  retry/backoff (Retry-After honoured up to CONTENT_FETCH_MAX_RETRY_AFTER). Each
+  domain is hit at most once per CONTENT_FETCH_DOMAIN_INTERVAL: URLs wait in
+  per-domain queues and are only handed to the pool once their domain's next slot
+  has come, so a busy domain never holds up workers that other domains could use.
+- HTML -> text extraction (BeautifulSoup) runs in a process pool, so parsing does not
+  hold the GIL the API threads need.
+- Only this (calling) thread writes to the DB.
+- Resumable: each run picks up rows whose content is still "". Pages that fail
+  permanently (404, 410, non-HTML, nothing extractable) are stored as NULL so
+  they are not retried. Transient failures stay "" and are retried by later runs
+  with a growing delay (content_attempts / content_retry_at), and stored as NULL
+  after CONTENT_FETCH_MAX_ATTEMPTS.
+"""
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+import feedparser
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from sqlalchemy import bindparam, or_, update
+from urllib3.util.retry import Retry
+
+from config import (
+    CONTENT_FETCH_MAX_PER_RUN, CONTENT_FETCH_WORKERS, CONTENT_FETCH_DOMAIN_INTERVAL,
+    CONTENT_FETCH_TIMEOUT, CONTENT_FETCH_RETRIES, CONTENT_FETCH_MAX_BYTES, CONTENT_FETCH_MAX_RETRY_AFTER,
+    CONTENT_FETCH_MAX_ATTEMPTS, CONTENT_FETCH_RETRY_MINUTES,
+    CONTENT_EXTRACT_PROCESSES, CONTENT_MAX_CHARS, FETCH_VERIFY_SSL,
+)
+from database import SessionLocal, Article
+from response_cache import bump_generation
+
+PERMANENT_STATUSES = {401, 403, 404, 410, 451}
+
+# Extraction processes must not be forked from the web process: it runs API, scheduler
+# and retag threads, and a fork copies any lock one of them holds at that moment.
+# forkserver forks them from a clean server that has only imported this module
+# (spawn where there is no forkserver, i.e. Windows).
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _MP_CONTEXT = multiprocessing.get_context("forkserver")
+    _MP_CONTEXT.set_forkserver_preload([__name__])
+else:
+    _MP_CONTEXT = multiprocessing.get_context("spawn")
+NOISE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg"]
+
+
+class _CappedRetry(Retry):
+    """Retry that waits at most CONTENT_FETCH_MAX_RETRY_AFTER for a Retry-After header."""
+
+    def get_retry_after(self, response):
+        seconds = super().get_retry_after(response)
+        return None if seconds is None else min(seconds, CONTENT_FETCH_MAX_RETRY_AFTER)
+
+
+class _InlineExecutor:
+    """Executor stand-in that runs work immediately (CONTENT_EXTRACT_PROCESSES=0)."""
+
+    def submit(self, fn, *args):
+        fut = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def extract_text(html, max_chars=CONTENT_MAX_CHARS):
+    """
+    Main text of an article page: paragraphs from <article>/<main>/<body> with
+    navigation and boilerplate removed. Returns "" if nothing usable is found.
+    html may be raw bytes (BeautifulSoup sniffs the charset).
+    Top-level so it can run in a worker process.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    paragraphs = [p.get_text(" ", strip=True) for p in root.find_all("p")]
+    text = "\n\n".join(p for p in paragraphs if len(p) > 40)
+    if not text:
+        text = root.get_text("\n", strip=True)
+    return text[:max_chars]
+
+
+def _http_session(pool_size):
+    http = requests.Session()
+    retry = _CappedRetry(
+        total=CONTENT_FETCH_RETRIES,
+        backoff_factor=1.0,  # 1s, 2s, 4s, ...
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    http.headers["User-Agent"] = feedparser.USER_AGENT
+    return http
+
+
+def _host_of(url):
+    return (urlparse(url).hostname or "").lower()
+
+
+def _download(http, url):
+    """Return (html bytes or None, permanent_failure)."""
+    try:
+        with http.get(url, timeout=CONTENT_FETCH_TIMEOUT, verify=FETCH_VERIFY_SSL, stream=True) as resp:
+            if resp.status_code >= 400:
+                return None, resp.status_code in PERMANENT_STATUSES
+            if "html" not in resp.headers.get("Content-Type", "html").lower():
+                return None, True
+            chunks, size = [], 0
+            for chunk in resp.iter_content(64 * 1024):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= CONTENT_FETCH_MAX_BYTES:
+                    break
+        return b"".join(chunks), False
+    except requests.RequestException:
+        return None, False
+
+
+def _store_content(updates):
+    """updates: {article_id: text or None}. One executemany UPDATE."""
+    if not updates:
+        return
+    stmt = (
+        update(Article.__table__)
+        .where(Article.__table__.c.id == bindparam("b_id"))
+        .values(content=bindparam("b_content"))
+    )
+    with SessionLocal() as s:
+        s.execute(stmt, [{"b_id": aid, "b_content": text} for aid, text in updates.items()])
+        s.commit()
+
+
+def _store_retries(retries):
+    """retries: {article_id: failed attempts so far}. Schedules each row's next attempt."""
+    if not retries:
+        return
+    now = datetime.now()
+    stmt = (
+        update(Article.__table__)
+        .where(Article.__table__.c.id == bindparam("b_id"))
+        .values(content_attempts=bindparam("b_attempts"), content_retry_at=bindparam("b_retry_at"))
+    )
+    rows = [
+        {"b_id": aid, "b_attempts": attempts,
+         "b_retry_at": now + timedelta(minutes=CONTENT_FETCH_RETRY_MINUTES * 2 ** (attempts - 1))}
+        for aid, attempts in retries.items()
+    ]
+    with SessionLocal() as s:
+        s.execute(stmt, rows)
+        s.commit()
+
+
+def fetch_missing_content(limit=CONTENT_FETCH_MAX_PER_RUN, workers=CONTENT_FETCH_WORKERS,
+                          processes=CONTENT_EXTRACT_PROCESSES, batch_size=50,
+                          domain_interval=CONTENT_FETCH_DOMAIN_INTERVAL):
+    """Fill Article.content for up to `limit` pending rows (newest first). Returns rows stored."""
+    with SessionLocal() as s:
+        pending = (
+            s.query(Article.id, Article.url, Article.content_attempts)
+             .filter(Article.content == "",
+                     or_(Article.content_retry_at.is_(None), Article.content_retry_at <= datetime.now()))
+             .order_by(Article.id.desc())
+             .limit(limit)
+             .all()
+        )
+    if not pending:
+        return 0
+
+    print(f"Fetching content for {len(pending)} article(s)...")
+    queued = {}  # domain -> (id, url, attempts) not submitted yet, newest first
+    for aid, url, attempts in pending:
+        queued.setdefault(_host_of(url), deque()).append((aid, url, attempts or 0))
+    next_slot = {}  # domain -> time.monotonic() its next download may start
+    updates, retries, stored, failed = {}, {}, 0, 0
+    extract_pool = (ProcessPoolExecutor(max_workers=processes, mp_context=_MP_CONTEXT) if processes > 0
+                    else _InlineExecutor())
+
+    download_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="content-fetch")
+    with _http_session(workers) as http, download_pool as pool, extract_pool:
+        running, extracting = {}, {}
+
+        def dispatch():
+            # Submit from every domain whose slot has come, round-robin, while workers are free.
+            # Returns seconds until the next slot opens (None if nothing is waiting for one).
+            now = time.monotonic()
+            for host in list(queued):
+                if len(running) >= workers:
+                    return None
+                if next_slot.get(host, 0.0) > now:
+                    continue
+                aid, url, attempts = queued[host].popleft()
+                if not queued[host]:
+                    del queued[host]
+                next_slot[host] = now + domain_interval
+                running[pool.submit(_download, http, url)] = (aid, attempts)
+            if not queued or len(running) >= workers:
+                return None
+            return max(0.0, min(next_slot[host] for host in queued) - now)
+
+        while queued or running:
+            delay = dispatch()
+            if not running:
+                time.sleep(delay)
+                continue
+            done, _ = wait(running, timeout=delay, return_when=FIRST_COMPLETED)
+            for fut in done:
+                aid, attempts = running.pop(fut)
+                html, permanent = fut.result()
+                if html is not None:
+                    extracting[extract_pool.submit(extract_text, html)] = aid
+                elif permanent or attempts + 1 >= CONTENT_FETCH_MAX_ATTEMPTS:
+                    updates[aid] = None
+                else:
+                    retries[aid] = attempts + 1
+                    failed += 1
+
+        for fut in as_completed(extracting):
+            aid = extracting[fut]
+            try:
+                updates[aid] = fut.result() or None
+            except Exception as e:
+                print(f" - Extraction failed for article {aid}: {e}")
+                updates[aid] = None
+            if len(updates) >= batch_size:
+                _store_content(updates)
+                stored += len(updates)
+                updates = {}
+
+    _store_content(updates)
+    stored += len(updates)
+    _store_retries(retries)
+    if stored:
+        bump_generation()  # full-text results may have changed
+    print(f"Content fetch finished. {stored} article(s) updated, {failed} left for retry.")
+    return stored
@@ -0,0 +1,120 @@
+# feed_schedule.py
+"""
+Adaptive per-feed polling (SCHEDULE_MODE=adaptive).
+
+Each parsed fetch tells us how many dated entries a feed shows and how far back
+the oldest one goes; entries / hours since that oldest entry is the feed's
+publish rate. A feed is polled about every POLL_TARGET_NEW_ENTRIES new entries,
+and at least twice per page of entries so nothing scrolls off between polls.
+The interval is clamped to [POLL_MIN_INTERVAL_MINUTES, POLL_MAX_INTERVAL_MINUTES]
+and jittered by +/- POLL_JITTER so feeds don't all come due together.
+
+An unchanged feed (304 / same body) is re-estimated from the stored entry stats,
+so the longer it stays quiet the lower its rate. Estimates are smoothed
+(POLL_RATE_SMOOTHING) and kept in the feed_schedule table, so a restart
+carries on with what was learned.
+"""
+import random
+from datetime import datetime, timedelta
+
+from config import (
+    POLL_MIN_INTERVAL_MINUTES, POLL_MAX_INTERVAL_MINUTES, POLL_TARGET_NEW_ENTRIES,
+    POLL_JITTER, POLL_RATE_SMOOTHING,
+)
+from database import FeedSchedule
+
+UNCHANGED = "unchanged"  # observation for a feed that answered 304 / sent the same body
+
+
+class FeedObservation:
+    """What one parsed fetch showed: all entries, and the dated ones' count/oldest timestamp."""
+
+    def __init__(self, page_size, dates, now=None):
+        now = now or datetime.now()
+        dates = [d for d in dates if d is not None and d <= now + timedelta(days=1)]  # ignore bogus future dates
+        self.page_size = page_size
+        self.entry_count = len(dates)
+        self.oldest = min(dates) if dates else None
+
+
+def observed_rate(entry_count, oldest, now):
+    """Entries per hour over [oldest, now], or None without dated entries."""
+    if not entry_count or oldest is None:
+        return None
+    hours = max((now - oldest).total_seconds() / 3600.0, 1 / 60.0)
+    return entry_count / hours
+
+
+def poll_interval(rate, page_size):
+    """Seconds until the next poll for a feed publishing `rate` entries/hour."""
+    lo, hi = POLL_MIN_INTERVAL_MINUTES * 60, POLL_MAX_INTERVAL_MINUTES * 60
+    if not rate:
+        return hi
+    target = POLL_TARGET_NEW_ENTRIES
+    if page_size:
+        target = min(target, max(1.0, page_size / 2.0))
+    return min(hi, max(lo, target / rate * 3600))
+
+
+def _update(row, observation, now):
+    if isinstance(observation, FeedObservation):
+        row.page_size = observation.page_size
+        row.entry_count = observation.entry_count
+        row.oldest_entry_at = observation.oldest
+    if observation is not None:
+        rate = observed_rate(row.entry_count, row.oldest_entry_at, now)
+        if rate is not None and row.rate_per_hour is not None:
+            rate = POLL_RATE_SMOOTHING * rate + (1 - POLL_RATE_SMOOTHING) * row.rate_per_hour
+        row.rate_per_hour = rate
+        row.interval_seconds = poll_interval(rate, row.page_size)
+    elif row.interval_seconds is None:
+        # Failed before we learned anything: retry soon, not in a day
+        row.interval_seconds = POLL_MIN_INTERVAL_MINUTES * 60
+
+    row.polls = (row.polls or 0) + 1
+    row.last_polled_at = now
+    jitter = random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+    row.next_poll_at = now + timedelta(seconds=row.interval_seconds * jitter)
+
+
+def record_polls(session, feed_urls, observations, now=None):
+    """
+    Update the schedule for every feed in `feed_urls` after a scrape.
+    observations: {feed_url: FeedObservation | UNCHANGED}; feeds missing from it
+    (fetch/parse errors, skipped runs) keep their rate and interval. Caller commits.
+    """
+    now = now or datetime.now()
+    rows = {r.feed_url: r for r in session.query(FeedSchedule).filter(FeedSchedule.feed_url.in_(list(feed_urls)))}
+    for feed_url in feed_urls:
+        row = rows.get(feed_url)
+        if row is None:
+            row = FeedSchedule(feed_url=feed_url, entry_count=0, page_size=0, polls=0)
+            session.add(row)
+        _update(row, observations.get(feed_url), now)
+
+
+def due_feeds(session, feed_urls, now=None):
+    """Feeds (in `feed_urls` order) never polled or whose next poll time has passed."""
+    now = now or datetime.now()
+    scheduled = dict(session.query(FeedSchedule.feed_url, FeedSchedule.next_poll_at))
+    return [
+        url for url in feed_urls
+        if scheduled.get(url) is None or scheduled[url] <= now
+    ]
+
+
+def schedule_summary(session):
+    """Per-feed schedule state, soonest poll first."""
+    rows = session.query(FeedSchedule).order_by(FeedSchedule.next_poll_at.asc()).all()
+    return [
+        {
+            "feed_url": r.feed_url,
+            "rate_per_hour": round(r.rate_per_hour, 4) if r.rate_per_hour is not None else None,
+            "interval_minutes": round(r.interval_seconds / 60, 1) if r.interval_seconds else None,
+            "entries": r.entry_count,
+            "polls": r.polls,
+            "last_polled_at": r.last_polled_at.isoformat() if r.last_polled_at else None,
+            "next_poll_at": r.next_poll_at.isoformat() if r.next_poll_at else None,
+        }
+        for r in rows
+    ]
@@ -0,0 +1,287 @@
+# feed_stream.py
+"""
+Incremental RSS/Atom parsing for the scraper.
+
+feedparser builds the whole document (including every full-HTML content:encoded
+body) before we look at a single entry. This parser is fed the response body
+chunk by chunk, keeps only the fields scrape_articles uses, drops each child of
+an <item> / <entry> (a full content:encoded body included) at its end tag and the
+entry itself once it has been read, and can stop reading once a date-ordered
+feed has gone past the DAYS_LIMIT cutoff.
+
+Entries are plain dicts with the keys scrape_articles reads from feedparser
+entries (title, link, summary, published_parsed, updated_parsed, plus
+feedburner_origlink when present), holding the same values feedparser would:
+HTML titles/summaries go through feedparser's sanitizer with relative links
+resolved, content:encoded / Atom content fills a missing summary, and xhtml
+text is rebuilt from its markup. `python benchmark.py parity` checks this.
+"""
+import re
+import time
+from datetime import datetime
+from urllib.parse import urljoin
+from xml.etree.ElementTree import XMLPullParser
+from xml.sax.saxutils import escape
+
+# Same date parsing, HTML detection, link resolution and sanitizing feedparser applies
+from feedparser.datetimes import _parse_date
+from feedparser.html import _cp1252
+from feedparser.mixin import _FeedParserMixin as FeedParserMixin
+from feedparser.sanitizer import _sanitize_html
+from feedparser.urls import resolve_relative_uris
+
+_map_content_type = FeedParserMixin.map_content_type
+_CP1252 = str.maketrans(_cp1252)
+_TAG_RE = re.compile(r"<(/?)[^>]*?(/?)>")
+
+ENTRY_TAGS = {"item", "entry"}
+
+ATOM_NAMESPACES = {"http://www.w3.org/2005/Atom", "http://purl.org/atom/ns#"}
+ITUNES_NAMESPACE = "http://www.itunes.com/dtds/podcast-1.0.dtd"
+CONTENT_NAMESPACE = "http://purl.org/rss/1.0/modules/content/"
+XML_BASE = "{http://www.w3.org/XML/1998/namespace}base"
+CORE_NAMESPACES = {"", "http://purl.org/rss/1.0/", "http://my.netscape.com/rdf/simple/0.9/",
+                   "http://backend.userland.com/rss2"} | ATOM_NAMESPACES
+# feedparser also reads dc:title / media:title and dc:description / media:description
+TITLE_NAMESPACES = CORE_NAMESPACES | {"http://purl.org/dc/elements/1.1/", "http://search.yahoo.com/mrss/",
+                                      "http://search.yahoo.com/mrss"}
+DESCRIPTION_NAMESPACES = TITLE_NAMESPACES
+
+# local tag name -> entry key; the last one seen wins, as in feedparser (dc:date is "updated")
+DATE_FIELDS = {
+    "pubDate": "published",
+    "published": "published",
+    "issued": "published",
+    "date": "updated",         # dc:date
+    "updated": "updated",
+    "modified": "updated",
+}
+HTML_TYPES = {"text/html", "application/xhtml+xml"}
+
+
+class StreamedFeed:
+    """Minimal stand-in for feedparser's result: .entries, .bozo, .bozo_exception."""
+
+    def __init__(self):
+        self.entries = []
+        self.bozo = False
+        self.bozo_exception = None
+        self.truncated = False  # stopped early at the date cutoff
+
+
+def _split(tag):
+    if tag.startswith("{"):
+        ns, _, name = tag[1:].partition("}")
+        return ns, name
+    return "", tag
+
+
+def _local(tag):
+    return _split(tag)[1]
+
+
+def _inner_xml(elem):
+    """Markup inside `elem` (xhtml content), without namespace prefixes, as feedparser rebuilds it."""
+    pieces = [escape(elem.text or "")]
+    for child in elem:
+        name = _local(child.tag)
+        attrs = "".join(f' {_local(k)}="{escape(v, {chr(34): "&quot;"})}"' for k, v in child.items())
+        pieces.append(f"<{name}{attrs}>{_inner_xml(child)}</{name}>")
+        pieces.append(escape(child.tail or ""))
+    return "".join(pieces)
+
+
+def _strip_wrapper_div(markup):
+    """Drop an enclosing <div> (the xhtml namespace wrapper) if everything is inside it."""
+    if not (markup.startswith("<div>") and markup.endswith("</div>")):
+        return markup
+    depth = 0
+    for m in _TAG_RE.finditer(markup):
+        if m.group(1):
+            depth -= 1
+            if depth == 0:
+                return markup[5:-6] if m.end() == len(markup) else markup
+        elif not m.group(2):
+            depth += 1
+    return markup
+
+
+def _text_value(elem, default_type, atom, base):
+    """
+    Text of a title/summary/content element, handled the way feedparser handles it:
+    plain text that looks like HTML is treated as HTML, and HTML has relative
+    links resolved against `base` and goes through feedparser's sanitizer (no
+    script, event handlers, etc.).
+    """
+    content_type = _map_content_type(elem.get("type", default_type))
+    if content_type == "application/xhtml+xml" or len(elem):
+        value = _inner_xml(elem)
+        if content_type == "application/xhtml+xml":
+            value = _strip_wrapper_div(value.strip())
+    else:
+        value = elem.text or ""
+    value = value.strip()
+    if not atom and content_type == "text/plain" and FeedParserMixin.looks_like_html(value):
+        content_type = "text/html"
+    if content_type in HTML_TYPES and value:
+        base = urljoin(base, elem.get(XML_BASE, ""))
+        value = resolve_relative_uris(value, base, "utf-8", content_type)
+        value = _sanitize_html(value, "utf-8", content_type)
+    return value.translate(_CP1252)
+
+
+class _EntryBuilder:
+    """
+    Builds the entry dict with the fields scrape_articles reads, matching what
+    feedparser returns for them (see benchmark.py parity), one child element at
+    a time, so each child (a content:encoded body included) can be cleared as
+    soon as its end tag has been read.
+    """
+
+    def __init__(self, elem, base="", atom=False):
+        self.elem = elem
+        self.base = urljoin(base, elem.get(XML_BASE, ""))
+        self.atom = atom
+        self.entry = {}
+        self.has_content = False
+
+    def add(self, child):
+        entry, base, atom = self.entry, self.base, self.atom
+        ns, name = _split(child.tag)
+        if name == "link" and ns in CORE_NAMESPACES:
+            href = child.get("href")
+            if href is None:
+                # RSS: <link>url</link>
+                href = (child.text or "").strip()
+                if href:
+                    entry["link"] = urljoin(base, href)
+            elif (child.get("rel", "alternate") == "alternate"
+                  and _map_content_type(child.get("type", "text/html")) in HTML_TYPES):
+                # Atom: <link rel="alternate" href="url"/>, the last one wins as in feedparser
+                entry["link"] = urljoin(base, href)
+            return
+        if name in ("guid", "id") and ns in CORE_NAMESPACES:
+            if child.get("isPermaLink", "true") == "true":
+                entry.setdefault("_guid_link", urljoin(base, (child.text or "").strip()))
+            return
+        if name == "origLink":
+            entry.setdefault("feedburner_origlink", (child.text or "").strip())
+            return
+        if name == "title" and ns in TITLE_NAMESPACES:
+            if not entry.get("title"):
+                entry["title"] = _text_value(child, "text/plain", atom, base)
+            return
+
+        # Summary, following feedparser: a description/summary replaces the summary,
+        # except that a second one before any content counts as content; content
+        # (content:encoded, Atom <content>) only fills a summary that is still missing.
+        is_summary = ((name == "description" and ns in DESCRIPTION_NAMESPACES)
+                      or (name == "summary" and ns in CORE_NAMESPACES | {ITUNES_NAMESPACE}))
+        is_content = (name == "encoded" and ns == CONTENT_NAMESPACE) or (name == "content" and ns in ATOM_NAMESPACES)
+        if is_summary and "summary" in entry and not self.has_content:
+            is_summary, is_content = False, True
+        if is_summary:
+            default = "text/html" if name == "description" else "text/plain"
+            entry["summary"] = _text_value(child, default, atom, base)
+            return
+        if is_content:
+            self.has_content = True
+            default = "text/html" if name in ("encoded", "description") else "text/plain"
+            if "summary" not in entry and _map_content_type(child.get("type", default)) in {"text/plain"} | HTML_TYPES:
+                entry["summary"] = _text_value(child, default, atom, base)
+            return
+
+        key = DATE_FIELDS.get(name)
+        if key:
+            entry[key] = (child.text or "").strip()
+
+    def finish(self):
+        entry = self.entry
+        # feedparser uses a permalink guid as the link when there is no <link>
+        guid_link = entry.pop("_guid_link", None)
+        if "link" not in entry and guid_link:
+            entry["link"] = guid_link
+
+        for key in ("published", "updated"):
+            if entry.get(key):
+                entry[key + "_parsed"] = _parse_date(entry[key])
+        # FeedParserDict answers "updated" with "published" when there is no update date
+        if "updated" not in entry and "published" in entry:
+            entry["updated"] = entry["published"]
+            entry["updated_parsed"] = entry.get("published_parsed")
+        return entry
+
+
+def _published_dt(entry):
+    # Mirrors scraper.get_published_date
+    struct = entry.get("published_parsed") or entry.get("updated_parsed")
+    if not struct:
+        return None
+    return datetime.fromtimestamp(time.mktime(struct))
+
+
+def iter_entries(chunks, cutoff=None, stop_after_old=5, feed=None, base=""):
+    """
+    Yield entry dicts from an iterable of byte chunks. `base` is the feed URL
+    relative links resolve against (feedparser's content-location).
+    If `cutoff` (naive local datetime) is given, stop reading after `stop_after_old`
+    consecutive dated entries older than it; that only happens on newest-first feeds.
+    Sets feed.truncated when it stops early. Raises xml.etree.ElementTree.ParseError
+    on malformed XML.
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    stack = []
+    builder = None  # the <item> / <entry> being read
+    old_streak = 0
+    atom = None
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if atom is None:
+                    ns, name = _split(elem.tag)
+                    atom = name == "feed" and ns in ATOM_NAMESPACES
+                    base = urljoin(base, elem.get(XML_BASE, ""))
+                if builder is None and _local(elem.tag) in ENTRY_TAGS:
+                    builder = _EntryBuilder(elem, base, atom)
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if builder is not None and stack and stack[-1] is builder.elem:
+                # A direct child of the entry: read it, then drop it (and its body)
+                builder.add(elem)
+                stack[-1].remove(elem)
+                elem.clear()
+                continue
+            if builder is None or elem is not builder.elem:
+                continue
+
+            entry = builder.finish()
+            builder = None
+            # Detach the finished entry so the tree never accumulates items
+            if stack:
+                stack[-1].remove(elem)
+            elem.clear()
+            yield entry
+
+            if cutoff is not None:
+                published = _published_dt(entry)
+                if published is not None:
+                    old_streak = old_streak + 1 if published < cutoff else 0
+                if stop_after_old and old_streak >= stop_after_old:
+                    if feed is not None:
+                        feed.truncated = True
+                    return
+    parser.close()
+
+
+def parse_stream(chunks, cutoff=None, stop_after_old=5, base=""):
+    """Collect iter_entries() into a StreamedFeed. Malformed XML raises ParseError."""
+    feed = StreamedFeed()
+    feed.entries = list(iter_entries(chunks, cutoff=cutoff, stop_after_old=stop_after_old, feed=feed, base=base))
+    return feed
+
@@ -0,0 +1,235 @@
+# fetcher.py
+import hashlib
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from xml.etree.ElementTree import ParseError
+
+import feedparser
+import requests
+import urllib3
+
+from config import (
+    DAYS_LIMIT, FETCH_WORKERS, FETCH_PER_HOST_LIMIT, FETCH_TIMEOUT, FETCH_VERIFY_SSL,
+    FEED_PARSER, STREAM_STOP_AFTER_OLD,
+)
+from feed_stream import parse_stream
+
+if not FETCH_VERIFY_SSL:
+    # Matches the old feedparser behaviour (unverified SSL context) without the warning spam.
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+CHUNK_SIZE = 64 * 1024
+
+
+# FeedResult.status values
+STATUS_OK = "ok"                      # downloaded and parsed
+STATUS_NOT_MODIFIED = "not_modified"  # server answered 304 to our conditional GET
+STATUS_UNCHANGED = "unchanged"        # 200, but body hash matches the cached one; not parsed
+STATUS_ERROR = "error"
+
+
+class FeedResult:
+    """
+    Outcome of fetching one feed. `feed` is only set for STATUS_OK, `error` only for
+    STATUS_ERROR. etag/last_modified/content_hash are the validators to cache.
+    """
+
+    def __init__(self, feed_url, status, feed=None, error=None,
+                 etag=None, last_modified=None, content_hash=None):
+        self.feed_url = feed_url
+        self.status = status
+        self.feed = feed
+        self.error = error
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        # Filled in by fetch_feed: seconds waiting on the network, seconds parsing, body bytes
+        self.fetch_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.bytes = 0
+
+    @property
+    def cache_hit(self):
+        return self.status in (STATUS_NOT_MODIFIED, STATUS_UNCHANGED)
+
+
+def _host_of(url):
+    return (urlparse(url).hostname or "").lower()
+
+
+def _metered_chunks(resp, deadline, meter, timeout):
+    """
+    Body chunks of `resp`, enforcing the per-feed deadline. Adds the bytes read and the
+    time spent waiting for them to meter["bytes"] / meter["network"].
+    """
+    chunks = resp.iter_content(CHUNK_SIZE)
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        meter["network"] += time.perf_counter() - started
+        if chunk is None:
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"feed download exceeded {timeout:g}s")
+        meter["bytes"] += len(chunk)
+        yield chunk
+
+
+def _read_body(resp, deadline, meter, timeout):
+    """Read the response body, giving up once the per-feed deadline passes."""
+    return b"".join(_metered_chunks(resp, deadline, meter, timeout))
+
+
+def _iter_body(resp, deadline, hasher, meter, timeout):
+    """Yield body chunks (hashing them as they pass), enforcing the per-feed deadline."""
+    for chunk in _metered_chunks(resp, deadline, meter, timeout):
+        hasher.update(chunk)
+        yield chunk
+
+
+def fetch_feed(feed_url, http=None, timeout=FETCH_TIMEOUT, cached=None, parser=FEED_PARSER):
+    """
+    Download and parse a single feed. Never raises; errors are returned on the result.
+    cached: optional dict with etag / last_modified / content_hash from the previous run;
+    used for a conditional GET and to skip parsing a byte-identical body.
+    parser: "stream" (feed_stream, stops at the DAYS_LIMIT cutoff) or "feedparser".
+    In stream mode the body is parsed while it downloads, so a matching hash only
+    skips the DB work, and the hash covers just the bytes that were read.
+    The result carries timings: fetch_seconds is time spent waiting on the server,
+    parse_seconds the rest (hashing and parsing).
+    """
+    meter = {"bytes": 0, "network": 0.0}
+    started = time.perf_counter()
+    result = _fetch_feed(feed_url, http, timeout, cached, parser, meter)
+    result.bytes = meter["bytes"]
+    result.fetch_seconds = meter["network"]
+    result.parse_seconds = max(0.0, time.perf_counter() - started - meter["network"])
+    return result
+
+
+def _fetch_feed(feed_url, http, timeout, cached, parser, meter):
+    http = http or requests
+    cached = cached or {}
+    deadline = time.monotonic() + timeout
+
+    req_headers = {"User-Agent": feedparser.USER_AGENT}
+    if cached.get("etag"):
+        req_headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        req_headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        requested = time.perf_counter()
+        resp = http.get(
+            feed_url,
+            headers=req_headers,
+            timeout=timeout,
+            verify=FETCH_VERIFY_SSL,
+            stream=True,
+        )
+        meter["network"] += time.perf_counter() - requested
+        with resp:
+            if resp.status_code == 304:
+                # Some servers omit validators on 304; keep the ones we sent
+                return FeedResult(
+                    feed_url, STATUS_NOT_MODIFIED,
+                    etag=resp.headers.get("ETag") or cached.get("etag"),
+                    last_modified=resp.headers.get("Last-Modified") or cached.get("last_modified"),
+                    content_hash=cached.get("content_hash"),
+                )
+            resp.raise_for_status()
+            headers = {k.lower(): v for k, v in resp.headers.items()}
+            if parser == "stream":
+                hasher = hashlib.sha256()
+                cutoff = datetime.now() - timedelta(days=DAYS_LIMIT)
+                try:
+                    feed = parse_stream(_iter_body(resp, deadline, hasher, meter, timeout), cutoff=cutoff,
+                                        stop_after_old=STREAM_STOP_AFTER_OLD, base=resp.url or feed_url)
+                except ParseError as e:
+                    feed = None
+                    print(f" - Streaming parse failed for {feed_url} ({e}); retrying with feedparser")
+                if feed is not None:
+                    status = STATUS_UNCHANGED if hasher.hexdigest() == cached.get("content_hash") else STATUS_OK
+                    return FeedResult(
+                        feed_url, status, feed=feed if status == STATUS_OK else None,
+                        etag=headers.get("etag"), last_modified=headers.get("last-modified"),
+                        content_hash=hasher.hexdigest(),
+                    )
+            else:
+                body = _read_body(resp, deadline, meter, timeout)
+
+        if parser == "stream":
+            # Malformed XML: feedparser is far more forgiving. Same validators, so an
+            # unchanged body still comes back as a cache hit.
+            return _fetch_feed(feed_url, http, timeout, cached, "feedparser", meter)
+
+        validators = dict(
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            content_hash=hashlib.sha256(body).hexdigest(),
+        )
+        if validators["content_hash"] == cached.get("content_hash"):
+            return FeedResult(feed_url, STATUS_UNCHANGED, **validators)
+
+        # content-location lets feedparser resolve relative links like parse(url) did
+        headers.setdefault("content-location", resp.url or feed_url)
+        feed = feedparser.parse(body, response_headers=headers)
+        return FeedResult(feed_url, STATUS_OK, feed=feed, **validators)
+    except Exception as e:
+        return FeedResult(feed_url, STATUS_ERROR, error=e)
+
+
+def fetch_feeds(feed_urls, validators=None, workers=FETCH_WORKERS, per_host=FETCH_PER_HOST_LIMIT,
+                timeout=FETCH_TIMEOUT):
+    """
+    Fetch feeds concurrently and yield a FeedResult for each as soon as it completes.
+    At most `workers` downloads run at once, and at most `per_host` against any one host,
+    so a slow publisher only holds up its own feeds: a feed is only handed to the pool
+    once its host has a free slot, so feeds waiting on a busy host never occupy a worker.
+    validators: optional {feed_url: {etag, last_modified, content_hash}} for conditional GETs.
+    Consumers run in the calling thread, so DB work can stay single-threaded.
+    """
+    validators = validators or {}
+    # Preserve order but drop repeated URLs (RSS_FEEDS has a couple of duplicates)
+    urls = list(dict.fromkeys(u for u in feed_urls if u))
+    if not urls:
+        return
+
+    workers, per_host = max(1, workers), max(1, per_host)
+    queued = {}  # host -> feeds not submitted yet, in order
+    for url in urls:
+        queued.setdefault(_host_of(url), deque()).append(url)
+    busy = dict.fromkeys(queued, 0)  # host -> feeds in the pool
+
+    with requests.Session() as http:
+        # Size the connection pool to the worker count so threads don't queue for sockets
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        http.mount("http://", adapter)
+        http.mount("https://", adapter)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="feed-fetch") as pool:
+            running = {}  # future -> host
+
+            def dispatch():
+                # Round-robin over hosts with a free slot, until every worker is busy
+                while len(running) < workers:
+                    ready = [h for h, q in queued.items() if q and busy[h] < per_host]
+                    if not ready:
+                        return
+                    for host in ready[:workers - len(running)]:
+                        url = queued[host].popleft()
+                        fut = pool.submit(fetch_feed, url, http=http, timeout=timeout, cached=validators.get(url))
+                        running[fut] = host
+                        busy[host] += 1
+
+            dispatch()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    busy[running.pop(fut)] -= 1
+                dispatch()
+                for fut in done:
+                    yield fut.result()
@@ -0,0 +1,80 @@
+# keyword_matcher.py
+from collections import deque
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a fixed keyword list.
+    Build it once per run; match() then scans each text in a single pass,
+    independent of how many keywords there are.
+
+    With word_boundary=True a keyword only counts when it is not glued to
+    letters/digits on either side ("ai" no longer matches inside "said").
+    """
+
+    def __init__(self, keywords, word_boundary=False):
+        # Keep the caller's order (and first occurrence) so results line up with the keyword list
+        self.keywords = [k for k in dict.fromkeys(keywords) if k]
+        self.word_boundary = word_boundary
+
+        self._goto = [{}]   # state -> {char: next_state}
+        self._fail = [0]
+        self._out = [[]]    # state -> keyword indexes ending here (incl. via fail links)
+
+        for idx, kw in enumerate(self.keywords):
+            state = 0
+            for ch in kw:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(idx)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def match(self, text):
+        """Return the keywords found in `text`, in keyword-list order."""
+        goto, fail, out = self._goto, self._fail, self._out
+        keywords = self.keywords
+        found = set()
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            for idx in out[state]:
+                if idx in found:
+                    continue
+                if self.word_boundary:
+                    start = pos - len(keywords[idx]) + 1
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if pos + 1 < len(text) and _is_word_char(text[pos + 1]):
+                        continue
+                found.add(idx)
+        return [keywords[i] for i in sorted(found)]
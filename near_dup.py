@@ -0,0 +1,269 @@
+# near_dup.py
+"""
+Near-duplicate detection for syndicated stories.
+
+Each article gets a 64-bit SimHash of its title words + the first LEAD_WORDS
+words of its summary, after dropping feed boilerplate. Syndicated copies differ
+mostly at the ends (truncated summaries, "The post ... appeared first on ...",
+a " - Source" title suffix), so hashing only the lead keeps them close; the
+features and NEAR_DUP_MAX_DISTANCE were picked with `python benchmark.py
+neardup` (labelled pairs from articles.db plus edited copies). The hash
+is split into NEAR_DUP_BANDS bands stored in fingerprint_bands; two hashes
+within NEAR_DUP_MAX_DISTANCE bits of each other always share at least one band
+exactly as long as MAX_DISTANCE < BANDS (pigeonhole), so finding candidates is
+a handful of index lookups instead of a scan. Candidates are then confirmed by
+Hamming distance. Fingerprints from other features or another
+NEAR_DUP_MAX_DISTANCE (which changes the bands) are rebuilt on startup.
+
+A match either drops the new article (NEAR_DUP_ACTION=drop) or stores it in
+the matched article's cluster (=cluster, the default); /articles/search can
+collapse clusters.
+"""
+import hashlib
+import html
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from config import NEAR_DUP_BANDS, NEAR_DUP_MAX_DISTANCE, NEAR_DUP_WINDOW_DAYS
+from database import WriteSessionLocal, Article, ArticleFingerprint, FingerprintBand, insert_ignore, chunked
+
+BAND_BITS = 64 // NEAR_DUP_BANDS
+_BAND_MASK = (1 << BAND_BITS) - 1
+_TAG_RE = re.compile(r"<[^>]+>")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Trailing " - Reuters" / " | The Verge" added by aggregators (at most 4 words)
+_SOURCE_SUFFIX_RE = re.compile(r"\s+[-|\u2013\u2014]\s+(?:\S+\s*){1,4}$")
+# "The post X appeared first on Y.", "Continue reading...", "[…]" and other feed trailers
+_BOILERPLATE_RE = re.compile(
+    r"\bthe post\b.*?\bappeared first on\b.*$|\b(?:continue|keep) reading\b.*$|\bread more\b.*$"
+    r"|\[(?:\u2026|\.\.\.)\]|\u2026|\.\.\.\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with"
+    .split()
+)
+LEAD_WORDS = 15  # summary words hashed; copies are often truncated further in
+
+
+def _plain(text):
+    return html.unescape(_TAG_RE.sub(" ", text or ""))
+
+
+def _tokens(text):
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def _h64(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(title, summary):
+    """64-bit SimHash (unsigned int) of title words + the summary's lead words, or None if there is no text."""
+    features = {}
+    for w in _tokens(_SOURCE_SUFFIX_RE.sub("", _plain(title))):
+        features["t:" + w] = features.get("t:" + w, 0) + 1
+    for w in _tokens(_BOILERPLATE_RE.sub(" ", _plain(summary)))[:LEAD_WORDS]:
+        features["s:" + w] = features.get("s:" + w, 0) + 1
+    if not features:
+        return None
+
+    vector = [0] * 64
+    for feature, weight in features.items():
+        h = _h64(feature)
+        for bit in range(64):
+            vector[bit] += weight if h >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(64) if vector[bit] > 0)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def bands(h):
+    """[(band, key)] for an unsigned 64-bit hash. Keys fit a signed BIGINT (a single band is the whole hash)."""
+    return [(i, to_signed((h >> (i * BAND_BITS)) & _BAND_MASK)) for i in range(NEAR_DUP_BANDS)]
+
+
+def to_signed(h):
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def to_unsigned(h):
+    return h + (1 << 64) if h < 0 else h
+
+
+class NearDupIndex:
+    """
+    Near-duplicate lookups for one scrape run: stored articles from the last
+    NEAR_DUP_WINDOW_DAYS (via fingerprint_bands) plus rows accepted earlier in this
+    run that are not stored yet (kept in memory).
+    """
+
+    def __init__(self, session, max_distance=NEAR_DUP_MAX_DISTANCE, window_days=NEAR_DUP_WINDOW_DAYS):
+        self.session = session
+        self.max_distance = max_distance
+        self.cutoff = datetime.now() - timedelta(days=window_days) if window_days else None
+        self._pending = {}  # (band, key) -> [(hash, url)]
+        self._cluster_by_url = {}  # url -> cluster id, url of the pending row it joined, or None
+
+    def find(self, h):
+        """
+        Closest match within max_distance: a stored cluster id, or the url of a
+        pending row from this run. None if there is no near-duplicate.
+        """
+        best = None
+        for bk in bands(h):
+            for other, url in self._pending.get(bk, ()):
+                d = hamming(h, other)
+                if d <= self.max_distance and (best is None or d < best[0]):
+                    best = (d, url)
+
+        q = (
+            self.session.query(ArticleFingerprint.simhash, ArticleFingerprint.cluster_id)
+                .join(FingerprintBand, FingerprintBand.article_id == ArticleFingerprint.article_id)
+                .filter(or_(*[and_(FingerprintBand.band == b, FingerprintBand.key == k) for b, k in bands(h)]))
+        )
+        if self.cutoff is not None:
+            q = q.filter(ArticleFingerprint.published_date >= self.cutoff)
+        for stored, cluster_id in q:
+            d = hamming(h, to_unsigned(stored))
+            if d <= self.max_distance and (best is None or d < best[0]):
+                best = (d, cluster_id)
+        return None if best is None else best[1]
+
+    def remember(self, h, url, match):
+        """Record a row accepted for insert, so later rows in this run can match it."""
+        for bk in bands(h):
+            self._pending.setdefault(bk, []).append((h, url))
+        self._cluster_by_url[url] = match
+
+    def forget_pending(self):
+        """Drop in-memory rows once they are stored (the band index finds them from then on)."""
+        self._pending.clear()
+
+    def cluster_for(self, url, article_id):
+        """Resolve a stored row's cluster id (its own id unless it matched something)."""
+        ref = self._cluster_by_url.get(url)
+        seen = set()
+        while isinstance(ref, str) and ref not in seen:  # joined a pending row: follow it
+            seen.add(ref)
+            ref = self._cluster_by_url.get(ref)
+        cluster = ref if isinstance(ref, int) else article_id
+        self._cluster_by_url[url] = cluster
+        return cluster
+
+
+def store_fingerprints(session, rows):
+    """rows: [(article_id, hash, cluster_id, published_date)]. Inserts fingerprints + band rows."""
+    if not rows:
+        return
+    session.execute(insert_ignore(ArticleFingerprint.__table__), [
+        {"article_id": aid, "simhash": to_signed(h), "cluster_id": cluster, "published_date": published}
+        for aid, h, cluster, published in rows
+    ])
+    session.execute(insert_ignore(FingerprintBand.__table__), [
+        {"band": b, "key": k, "article_id": aid}
+        for aid, h, _, _ in rows
+        for b, k in bands(h)
+    ])
+
+
+def store_new_fingerprints(session, index, rows, hashes):
+    """
+    Fingerprint freshly inserted scraper rows. hashes: {url: hash} for rows that
+    went through index.find()/remember(). Clusters resolve in row order.
+    """
+    url_by_key = {row["url_key"]: row["url"] for row in rows if row["url"] in hashes}
+    if not url_by_key:
+        return
+    urls = list(url_by_key.values())
+    stored = {
+        url_by_key[key]: (aid, published)
+        for chunk in chunked(url_by_key)
+        for aid, key, published in session.query(Article.id, Article.url_key, Article.published_date)
+                                          .filter(Article.url_key.in_(chunk))
+    }
+    store_fingerprints(session, [
+        (stored[url][0], hashes[url], index.cluster_for(url, stored[url][0]), stored[url][1])
+        for url in urls if url in stored
+    ])
+
+
+def delete_fingerprints(session, article_ids):
+    """Remove fingerprints of deleted articles (SQLite doesn't enforce the FK cascade)."""
+    for ids in chunked(article_ids):
+        session.query(FingerprintBand).filter(FingerprintBand.article_id.in_(ids)).delete(synchronize_session=False)
+        session.query(ArticleFingerprint).filter(ArticleFingerprint.article_id.in_(ids)).delete(synchronize_session=False)
+
+
+def _fingerprints_current(session, sample=5):
+    """
+    False if the newest stored fingerprints don't match what simhash()/bands()
+    give today (the features or NEAR_DUP_MAX_DISTANCE changed since they were stored).
+    """
+    newest = (
+        session.query(ArticleFingerprint.article_id, ArticleFingerprint.simhash, Article.title, Article.summary)
+               .join(Article, Article.id == ArticleFingerprint.article_id)
+               .order_by(ArticleFingerprint.article_id.desc())
+               .limit(sample)
+               .all()
+    )
+    for aid, stored, title, summary in newest:
+        h = simhash(title, summary)
+        if h is None or to_signed(h) != stored:
+            return False
+        stored_bands = session.query(FingerprintBand.band, FingerprintBand.key).filter(FingerprintBand.article_id == aid)
+        if set(stored_bands) != set(bands(h)):
+            return False
+    return True
+
+
+def backfill_fingerprints(batch_size=2000):
+    """
+    One-off migration: fingerprint and cluster existing articles, oldest first.
+    Runs while article_fingerprints is empty, or after dropping fingerprints that
+    are out of date (see _fingerprints_current). Returns the number of articles
+    that joined an existing cluster.
+    """
+    clustered, total = 0, 0
+    with WriteSessionLocal() as s:
+        if s.query(ArticleFingerprint.article_id).limit(1).first() is not None:
+            if _fingerprints_current(s):
+                return 0
+            print("Near-duplicate fingerprints are out of date; rebuilding them (one-time)...")
+            s.query(FingerprintBand).delete(synchronize_session=False)
+            s.query(ArticleFingerprint).delete(synchronize_session=False)
+        index = NearDupIndex(s, window_days=0)
+        last_id = 0
+        while True:
+            batch = (
+                s.query(Article.id, Article.url, Article.title, Article.summary, Article.published_date)
+                 .filter(Article.id > last_id)
+                 .order_by(Article.id.asc())
+                 .limit(batch_size)
+                 .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            rows = []
+            for aid, url, title, summary, published in batch:
+                h = simhash(title, summary)
+                if h is None:
+                    continue
+                match = index.find(h)
+                index.remember(h, url, match)
+                cluster = index.cluster_for(url, aid)
+                clustered += cluster != aid
+                rows.append((aid, h, cluster, published))
+            # Stored per batch, so later batches find these through the band index
+            store_fingerprints(s, rows)
+            index.forget_pending()
+            total += len(rows)
+        s.commit()
+    if total:
+        print(f"Fingerprinted {total} article(s); {clustered} near-duplicate(s) clustered.")
+    return clustered
@@ -0,0 +1,174 @@
+# profiling.py
+"""
+Opt-in request profiling for the Flask API.
+
+A request is profiled when PROFILING=1 is set for the process, or when it carries
+an "X-Profile: 1" header. For profiled requests we record:
+
+- SQL statements and time spent in them (SQLAlchemy events on every engine: the
+  read, write and archive engines all serve requests),
+- JSON serialization time (app.json provider),
+- total latency,
+
+return them in a Server-Timing header, and add them to an in-memory rolling
+window per route, served by GET /debug/profile. Each process keeps its own
+window (gunicorn workers are reported separately).
+"""
+import threading
+import time
+from collections import deque
+
+from flask import jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import PROFILING, PROFILE_HEADER, PROFILE_WINDOW
+
+# Latency buckets (ms) for the histogram; the last bucket is open-ended
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_local = threading.local()  # .stats while a profiled request runs on this thread
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+class RouteHistogram:
+    """Last `window` samples per route; summaries are computed on read."""
+
+    def __init__(self, window=PROFILE_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, route, total_ms, sql_ms, sql_count, serialize_ms):
+        with self._lock:
+            samples = self._samples.get(route)
+            if samples is None:
+                samples = self._samples[route] = deque(maxlen=self.window)
+            samples.append((total_ms, sql_ms, sql_count, serialize_ms))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            snapshot = {route: list(samples) for route, samples in self._samples.items()}
+        out = {}
+        for route, samples in sorted(snapshot.items()):
+            totals = sorted(s[0] for s in samples)
+            n = len(samples)
+            # [upper bound ms (None = +inf), count], non-cumulative
+            buckets = [[b, 0] for b in BUCKETS_MS] + [[None, 0]]
+            for t in totals:
+                for bucket in buckets:
+                    if bucket[0] is None or t <= bucket[0]:
+                        bucket[1] += 1
+                        break
+            out[route] = {
+                "count": n,
+                "total_ms": {
+                    "p50": round(_percentile(totals, 50), 2),
+                    "p90": round(_percentile(totals, 90), 2),
+                    "p99": round(_percentile(totals, 99), 2),
+                    "max": round(totals[-1], 2),
+                },
+                "mean_sql_ms": round(sum(s[1] for s in samples) / n, 2),
+                "mean_sql_count": round(sum(s[2] for s in samples) / n, 2),
+                "max_sql_count": max(s[2] for s in samples),
+                "mean_serialize_ms": round(sum(s[3] for s in samples) / n, 2),
+                "buckets": buckets,
+            }
+        return out
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+HISTOGRAM = RouteHistogram()
+
+
+class ProfilingJSONProvider(DefaultJSONProvider):
+    """jsonify() goes through response(); time it for profiled requests."""
+
+    def response(self, *args, **kwargs):
+        stats = getattr(_local, "stats", None)
+        if stats is None:
+            return super().response(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().response(*args, **kwargs)
+        finally:
+            stats.serialize_seconds += time.perf_counter() - started
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, "stats", None) is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = getattr(_local, "stats", None)
+    starts = conn.info.get("profile_query_start")
+    if stats is None or not starts:
+        return
+    stats.sql_count += 1
+    stats.sql_seconds += time.perf_counter() - starts.pop()
+
+
+def _wants_profile():
+    return PROFILING or request.headers.get(PROFILE_HEADER) == "1"
+
+
+def init_profiling(app):
+    """Hook profiling into `app` and every SQLAlchemy engine, and register GET /debug/profile."""
+    app.json = ProfilingJSONProvider(app)
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def _start_profile():
+        _local.stats = RequestStats() if _wants_profile() else None
+
+    @app.after_request
+    def _finish_profile(response):
+        stats = getattr(_local, "stats", None)
+        if stats is None:
+            return response
+        total_ms = 1000 * (time.perf_counter() - stats.started)
+        sql_ms = 1000 * stats.sql_seconds
+        serialize_ms = 1000 * stats.serialize_seconds
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={sql_ms:.2f};desc="{stats.sql_count} queries", '
+            f"serialize;dur={serialize_ms:.2f}, total;dur={total_ms:.2f}",
+        )
+        if request.endpoint != "debug_profile":
+            route = f"{request.method} {request.url_rule.rule if request.url_rule else '<unmatched>'}"
+            HISTOGRAM.add(route, total_ms, sql_ms, stats.sql_count, serialize_ms)
+        return response
+
+    @app.teardown_request
+    def _clear_profile(exc):
+        _local.stats = None
+
+    @app.route('/debug/profile', methods=['GET', 'DELETE'])
+    def debug_profile():
+        """Per-route latency/SQL summary of recent profiled requests. DELETE clears it."""
+        if request.method == 'DELETE':
+            HISTOGRAM.reset()
+            return jsonify({"reset": True})
+        return jsonify({"enabled_for_all_requests": PROFILING, "window": HISTOGRAM.window,
+                        "routes": HISTOGRAM.summary()})
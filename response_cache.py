@@ -0,0 +1,75 @@
+# response_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+from database import SessionLocal, CacheState
+
+
+class ResponseCache:
+    """
+    Thread-safe, size-bounded LRU of serialized responses: key -> (body_bytes, etag).
+    Keys include the cache generation, so bumping the generation makes every older
+    entry unreachable; those entries simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, body):
+        """Store a serialized body and return its ETag."""
+        etag = hashlib.sha1(body).hexdigest()
+        if self.max_entries <= 0:
+            return etag
+        with self._lock:
+            self._entries[key] = (body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def current_generation(session=None):
+    """Generation the cached responses must match; 0 before anything bumped it."""
+    if session is None:
+        with SessionLocal() as s:
+            return current_generation(s)
+    row = session.query(CacheState.generation).filter(CacheState.id == 1).first()
+    return row[0] if row else 0
+
+
+def bump_generation(session=None):
+    """
+    Invalidate every cached response. Pass a session to bump inside the caller's
+    transaction (e.g. the scraper's), otherwise this commits on its own.
+    """
+    if session is None:
+        with SessionLocal() as s:
+            bump_generation(s)
+            s.commit()
+        return
+    updated = (
+        session.query(CacheState)
+               .filter(CacheState.id == 1)
+               .update({CacheState.generation: CacheState.generation + 1}, synchronize_session=False)
+    )
+    if not updated:
+        session.add(CacheState(id=1, generation=1))
@@ -0,0 +1,115 @@
+# retagger.py
+"""
+Keep stored articles in line with keyword edits without rescanning the corpus
+against every keyword:
+
+- backfill_keywords(new):   match only the *new* keywords against stored
+                            title/summary/content, in id-ordered batches.
+- remove_keyword_tags(old): find affected articles through the article_tags
+                            index and strip the tag from just those rows.
+"""
+from sqlalchemy import bindparam, update
+
+from database import WriteSessionLocal, Article, ArticleTag, IN_CHUNK_SIZE, canon_tag, chunked, insert_ignore
+from response_cache import bump_generation
+from scraper import build_keyword_matcher
+
+
+def _display_tags(tags_str):
+    """Article.tags as the list of stored (display) tokens."""
+    return [p.strip() for p in (tags_str or "").strip(",").split(",") if p.strip()]
+
+
+def _tags_str(tags):
+    # Same ",tag1,tag2," format the scraper writes
+    return "," + ",".join(sorted(tags)) + "," if tags else ""
+
+
+def _update_tags(session, updates):
+    """updates: {article_id: tags_str}. One executemany UPDATE."""
+    if not updates:
+        return
+    stmt = (
+        update(Article.__table__)
+        .where(Article.__table__.c.id == bindparam("b_id"))
+        .values(tags=bindparam("b_tags"))
+    )
+    session.execute(stmt, [{"b_id": aid, "b_tags": tags} for aid, tags in updates.items()])
+
+
+def backfill_keywords(keywords, batch_size=2000):
+    """Tag existing articles that mention any of `keywords`. Returns articles updated."""
+    keywords = [k for k in dict.fromkeys(canon_tag(k) for k in keywords) if k]
+    if not keywords:
+        return 0
+    matcher = build_keyword_matcher(keywords)
+
+    updated, last_id = 0, 0
+    with WriteSessionLocal() as s:
+        while True:
+            batch = (
+                s.query(Article.id, Article.title, Article.summary, Article.content,
+                        Article.tags, Article.published_date)
+                 .filter(Article.id > last_id)
+                 .order_by(Article.id.asc())
+                 .limit(batch_size)
+                 .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            tag_updates, tag_rows = {}, []
+            for (aid, title, summary, content, tags_str, published) in batch:
+                text = " ".join(filter(None, (title, summary, content))).lower()
+                found = matcher.match(text)
+                if not found:
+                    continue
+                current = _display_tags(tags_str)
+                have = {canon_tag(t) for t in current}
+                new = [k for k in found if k not in have]
+                if not new:
+                    continue
+                tag_updates[aid] = _tags_str(current + new)
+                tag_rows.extend({"article_id": aid, "tag": k, "published_date": published} for k in new)
+
+            if tag_updates:
+                _update_tags(s, tag_updates)
+                s.execute(insert_ignore(ArticleTag.__table__), tag_rows)
+                updated += len(tag_updates)
+            s.commit()  # also ends batches without matches: the write lock is held per transaction
+
+        if updated:
+            bump_generation(s)
+            s.commit()
+    print(f"Keyword backfill finished: {updated} article(s) tagged with {keywords}.")
+    return updated
+
+
+def remove_keyword_tags(keywords, batch_size=IN_CHUNK_SIZE):
+    """Strip `keywords` from the tags of stored articles. Returns articles updated."""
+    tokens = [k for k in dict.fromkeys(canon_tag(k) for k in keywords) if k]
+    if not tokens:
+        return 0
+
+    updated = 0
+    with WriteSessionLocal() as s:
+        ids = [aid for (aid,) in s.query(ArticleTag.article_id).filter(ArticleTag.tag.in_(tokens)).distinct()]
+        drop = set(tokens)
+        for chunk in chunked(ids, batch_size):
+            tag_updates = {
+                aid: _tags_str([t for t in _display_tags(tags_str) if canon_tag(t) not in drop])
+                for (aid, tags_str) in s.query(Article.id, Article.tags).filter(Article.id.in_(chunk))
+            }
+            _update_tags(s, tag_updates)
+            s.query(ArticleTag).filter(
+                ArticleTag.article_id.in_(chunk), ArticleTag.tag.in_(tokens)
+            ).delete(synchronize_session=False)
+            s.commit()
+            updated += len(tag_updates)
+
+        if updated:
+            bump_generation(s)
+            s.commit()
+    print(f"Keyword removal finished: {tokens} removed from {updated} article(s).")
+    return updated
@@ -0,0 +1,162 @@
+# retention.py
+"""
+Retention for articles.db: move articles older than RETENTION_DAYS into a
+separate archive SQLite file, then compact the hot DB.
+
+- The archive keeps the same ids, columns and tag rows (so /articles/search can
+  fall through to it with "include_archive"); the bulky content column is
+  zlib-compressed.
+- Rows move in batches: each batch is committed to the archive before it is
+  deleted from the hot tables, so a crash can only leave a row in both places
+  (it is skipped on the next run), never in neither.
+- Afterwards the hot DB runs an incremental VACUUM and ANALYZE.
+- The same job prunes scrape_runs (see scrape_metrics.prune_runs), with or
+  without RETENTION_DAYS.
+"""
+import os
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String, Text, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from config import ARCHIVE_DB_PATH, DAYS_LIMIT, RETENTION_BATCH_SIZE, RETENTION_DAYS
+from database import WriteSessionLocal, Article, ArticleTag, chunked, engine, make_engine
+from near_dup import delete_fingerprints
+from response_cache import bump_generation
+from scrape_metrics import prune_runs
+
+ArchiveBase = declarative_base()
+
+
+class ArchivedArticle(ArchiveBase):
+    __tablename__ = "articles"
+    id = Column(Integer, primary_key=True)  # same id as in the hot DB
+    title = Column(String, nullable=False)
+    url = Column(String, nullable=False, unique=True)
+    published_date = Column(DateTime, nullable=True)
+    summary = Column(Text, nullable=True)
+    source = Column(String, nullable=True)
+    tags = Column(String, nullable=True)
+    content_z = Column(LargeBinary, nullable=True)  # zlib(content utf-8)
+    archived_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_archive_published_id", "published_date", "id"),
+    )
+
+    @property
+    def content(self):
+        return zlib.decompress(self.content_z).decode("utf-8") if self.content_z is not None else None
+
+
+class ArchivedArticleTag(ArchiveBase):
+    __tablename__ = "article_tags"
+    article_id = Column(Integer, primary_key=True)
+    tag = Column(String, primary_key=True)
+    published_date = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_archive_tags_tag_published", "tag", "published_date"),
+    )
+
+
+archive_engine = make_engine("sqlite:///" + ARCHIVE_DB_PATH)
+ArchiveSession = sessionmaker(autocommit=False, autoflush=False, bind=archive_engine)
+
+
+def archive_exists():
+    """True if an archive has been written (search fall-through has something to read)."""
+    return os.path.exists(ARCHIVE_DB_PATH)
+
+
+def _archive_batch(hot, cold, cutoff, batch_size):
+    """Move one batch of expired articles. Returns the number moved."""
+    batch = (
+        hot.query(Article)
+           .filter(Article.published_date < cutoff)
+           .order_by(Article.published_date.asc(), Article.id.asc())
+           .limit(batch_size)
+           .all()
+    )
+    if not batch:
+        return 0
+    ids = [a.id for a in batch]
+    now = datetime.now()
+    rows = [
+        {
+            "id": a.id, "title": a.title, "url": a.url, "published_date": a.published_date,
+            "summary": a.summary, "source": a.source, "tags": a.tags,
+            "content_z": zlib.compress(a.content.encode("utf-8")) if a.content else None,
+            "archived_at": now,
+        }
+        for a in batch
+    ]
+    tag_rows = [
+        {"article_id": aid, "tag": tag, "published_date": published}
+        for chunk in chunked(ids)
+        for (aid, tag, published) in hot.query(ArticleTag.article_id, ArticleTag.tag, ArticleTag.published_date)
+                                        .filter(ArticleTag.article_id.in_(chunk))
+    ]
+
+    # Archive first (durable), then delete from the hot tables
+    cold.execute(sqlite_insert(ArchivedArticle.__table__).on_conflict_do_nothing(), rows)
+    if tag_rows:
+        cold.execute(sqlite_insert(ArchivedArticleTag.__table__).on_conflict_do_nothing(), tag_rows)
+    cold.commit()
+
+    delete_fingerprints(hot, ids)
+    for chunk in chunked(ids):
+        hot.query(ArticleTag).filter(ArticleTag.article_id.in_(chunk)).delete(synchronize_session=False)
+        hot.query(Article).filter(Article.id.in_(chunk)).delete(synchronize_session=False)
+    hot.commit()
+    hot.expunge_all()
+    return len(ids)
+
+
+def compact():
+    """Give freed pages back to the filesystem and refresh planner statistics."""
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+            # One-time switch to incremental mode; only takes effect after a full VACUUM
+            print("Converting articles.db to auto_vacuum=INCREMENTAL (one-time full VACUUM)...")
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+        else:
+            conn.execute(text("PRAGMA incremental_vacuum"))
+        conn.execute(text("ANALYZE"))
+
+
+def run_retention(days=RETENTION_DAYS, batch_size=RETENTION_BATCH_SIZE):
+    """Archive and delete articles older than `days`, and prune old scrape runs. Returns the number archived."""
+    prune_runs()
+    if not days or days <= 0:
+        return 0
+    if days < DAYS_LIMIT:
+        # Anything younger than DAYS_LIMIT would just be scraped again
+        print(f"RETENTION_DAYS={days} is below DAYS_LIMIT={DAYS_LIMIT}; using {DAYS_LIMIT}.")
+        days = DAYS_LIMIT
+    cutoff = datetime.now() - timedelta(days=days)
+
+    ArchiveBase.metadata.create_all(bind=archive_engine)
+    moved = 0
+    with WriteSessionLocal() as hot, ArchiveSession() as cold:
+        while True:
+            n = _archive_batch(hot, cold, cutoff, batch_size)
+            if not n:
+                break
+            moved += n
+        if moved:
+            bump_generation(hot)
+            hot.commit()
+
+    if moved:
+        compact()
+    print(f"Retention: archived {moved} article(s) older than {days} days to {ARCHIVE_DB_PATH}.")
+    return moved
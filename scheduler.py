@@ -1,29 +1,224 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
 from apscheduler.schedulers.background import BackgroundScheduler
+from config import (
+    SCHEDULER_LOCK_PATH, CONTENT_FETCH_ENABLED, RSS_FEEDS,
+    SCHEDULE_MODE, SCRAPE_TIME, POLL_TICK_SECONDS,
+)
+from content_fetcher import fetch_missing_content
+from database import SessionLocal
+from feed_schedule import due_feeds
+from retagger import backfill_keywords, remove_keyword_tags
+from retention import run_retention
 from scraper import scrape_articles
 
-def job():
-    print("Scheduled scraping job started.")
-    scrape_articles()
-    # scrape_linkedin_posts()
-    print("Scheduled scraping job finished.")
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process guard, every process may schedule
+    fcntl = None
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from scraper import scrape_articles
+# Progress of scraping in *this* process; served by GET /ready.
+_status = {
+    "scheduler": "not started",
+    "initial_scrape": "pending",
+    "running": False,
+    "feeds_done": 0,
+    "feeds_total": 0,
+    "last_started_at": None,
+    "last_finished_at": None,
+    "last_error": None,
+}
+_status_lock = threading.Lock()
+_job_lock = threading.Lock()  # scheduled runs and POST /restart never overlap
+_lock_file = None
+# Keyword re-tagging runs one job at a time, in the order the edits were made
+_retag_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retag")
+# Article bodies are fetched on their own thread, outside _job_lock: a run can take
+# minutes on a slow site and must not hold up scrapes, re-tagging or POST /restart
+_content_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="content")
+_content_lock = threading.Lock()
+_content_queued = None
+
+def _set_status(**kwargs):
+    with _status_lock:
+        _status.update(kwargs)
 
-def job():
+def scrape_status():
+    """Snapshot of the scrape progress for this process."""
+    with _status_lock:
+        return dict(_status)
+
+def _on_progress(done, total):
+    _set_status(feeds_done=done, feeds_total=total)
+
+def _mark_initial_done():
+    if scrape_status()["initial_scrape"] != "done":
+        _set_status(initial_scrape="done")
+
+def job(feed_urls=None, maintenance=True):
+    """
+    Scrape `feed_urls` (default: every feed), queue a fetch of missing article
+    bodies (see schedule_content_fetch), and with `maintenance` also run retention.
+    """
+    with _job_lock:
+        _run_job(feed_urls, maintenance)
+
+def _run_job(feed_urls, maintenance):
+    # Caller holds _job_lock
     print("Scheduled scraping job started.")
-    scrape_articles()
-    # scrape_linkedin_posts()
+    _set_status(running=True, feeds_done=0, feeds_total=0,
+                last_started_at=datetime.now().isoformat(), last_error=None)
+    try:
+        scrape_articles(feed_urls, progress=_on_progress)
+        if CONTENT_FETCH_ENABLED:
+            schedule_content_fetch()
+        if maintenance:
+            run_retention()
+        # scrape_linkedin_posts()
+    except Exception as e:
+        _set_status(last_error=str(e))
+        raise
+    finally:
+        _set_status(running=False, last_finished_at=datetime.now().isoformat())
+        _mark_initial_done()
     print("Scheduled scraping job finished.")
 
-def start_scheduler():
+def poll_due_feeds():
+    """
+    Adaptive mode: scrape only the feeds whose next poll time has come (see feed_schedule.py).
+    A tick that finds a scrape, re-tag or retention run holding _job_lock is skipped; the
+    due list is taken under the lock, so feeds a running scrape covers are never polled twice.
+    """
+    if not _job_lock.acquire(blocking=False):
+        print("Previous job still running; skipping this poll.")
+        return
+    try:
+        with SessionLocal() as s:
+            due = due_feeds(s, RSS_FEEDS)
+        if not due:
+            _mark_initial_done()
+            return
+        print(f"{len(due)} feed(s) due for polling.")
+        _run_job(due, maintenance=False)
+    finally:
+        _job_lock.release()
+
+def maintenance_job():
+    """Adaptive mode's daily job: retention (scraping happens per feed in poll_due_feeds)."""
+    with _job_lock:
+        run_retention()
+
+def initial_job():
+    """First run after startup. Adaptive mode only polls feeds that are due, so restarts keep the schedule."""
+    if SCHEDULE_MODE == "adaptive":
+        poll_due_feeds()
+    else:
+        job()
+
+def _retag(added, removed):
+    # Waits for a running scrape, so articles it inserts are covered too
+    with _job_lock:
+        try:
+            if removed:
+                remove_keyword_tags(removed)
+            if added:
+                backfill_keywords(added)
+        except Exception as e:
+            print(f"Keyword re-tagging failed: {e}")
+
+def schedule_retag(added=(), removed=()):
+    """Re-tag stored articles after a keyword edit, in the background."""
+    if added or removed:
+        _retag_pool.submit(_retag, list(added), list(removed))
+
+def _fetch_content():
+    try:
+        fetch_missing_content()
+    except Exception as e:
+        print(f"Content fetch failed: {e}")
+
+def schedule_content_fetch():
+    """
+    Fetch missing article bodies in the background. A run that is queued but not
+    started yet already covers rows stored since, so no second one is queued.
+    """
+    global _content_queued
+    with _content_lock:
+        queued = _content_queued
+        if queued is not None and not queued.running() and not queued.done():
+            return queued
+        _content_queued = _content_pool.submit(_fetch_content)
+        return _content_queued
+
+def acquire_scheduler_lock(path=SCHEDULER_LOCK_PATH):
+    """
+    Take a non-blocking exclusive lock on `path` for the life of the process.
+    Returns False if another process already holds it.
+    """
+    global _lock_file
+    if _lock_file is not None:
+        return True
+    if fcntl is None:
+        return True
+    f = open(path, "a+")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _lock_file = f
+    return True
+
+def add_jobs(scheduler):
+    hour, minute = (int(part) for part in SCRAPE_TIME.split(":"))
+    if SCHEDULE_MODE == "adaptive":
+        # A tick that finds _job_lock held (scrape, re-tag, retention) returns at once, see poll_due_feeds
+        scheduler.add_job(func=poll_due_feeds, trigger="interval", seconds=POLL_TICK_SECONDS,
+                          id="poll-due-feeds", max_instances=1, coalesce=True)
+        scheduler.add_job(func=maintenance_job, trigger="cron", hour=hour, minute=minute, id="daily-maintenance")
+    else:
+        # Every feed once a day at SCRAPE_TIME
+        scheduler.add_job(func=job, trigger="cron", hour=hour, minute=minute, id="daily-scrape")
+
+def start_scheduler(mode="background"):
+    """
+    mode: "background" (initial scrape runs on the scheduler's thread, so this returns
+    immediately), "blocking" (initial scrape finishes before returning), "maintenance"
+    (no scraping, only the daily retention job; queue workers scrape) or "off".
+    Returns the started scheduler, or None if this process doesn't own scheduling.
+    """
+    if mode == "off":
+        _set_status(scheduler="disabled", initial_scrape="skipped")
+        print("Scheduler disabled in this process (SCHEDULER_MODE=off).")
+        return None
+    if not acquire_scheduler_lock():
+        _set_status(scheduler="owned by another process", initial_scrape="skipped")
+        print("Scheduler already running in another process; not starting one here.")
+        return None
+
     scheduler = BackgroundScheduler()
-    # Run the scraping job immediately on startup
-    print("Running initial scraping job on startup...")
-    job()
+    if mode == "maintenance":
+        # Retention stays with the process that serves the archive (see work_queue.py)
+        _set_status(initial_scrape="skipped")
+        hour, minute = (int(part) for part in SCRAPE_TIME.split(":"))
+        scheduler.add_job(func=maintenance_job, trigger="cron", hour=hour, minute=minute, id="daily-maintenance")
+        scheduler.start()
+        _set_status(scheduler="maintenance only")
+        print("Scheduler started (maintenance only).")
+        return scheduler
+    if mode == "blocking":
+        # Run the scraping job immediately on startup
+        print("Running initial scraping job on startup...")
+        initial_job()
+    else:
+        print("Scheduling initial scraping job in the background...")
+        _set_status(initial_scrape="running")
+        scheduler.add_job(func=initial_job, trigger="date", run_date=datetime.now(), id="initial-scrape")
 
-    # Schedule the job to run daily at 12:00 PM
-    scheduler.add_job(func=job, trigger="cron", hour=12, minute=0)
+    add_jobs(scheduler)
     scheduler.start()
+    _set_status(scheduler="running")
     print("Scheduler started.")
-
+    return scheduler
@@ -0,0 +1,238 @@
+# scrape_metrics.py
+"""
+Structured timing/counters for scrape runs.
+
+scrape_articles() fills a RunStats (one FeedStats per feed) as it goes, then
+save_run() persists it to the scrape_runs table. GET /metrics renders the
+stored runs in Prometheus text format, so the numbers are visible from the web
+process even when scraping happens in worker.py. In adaptive mode a run covers
+only the feeds that were due, so the per-feed gauges come from each feed's
+latest run. Runs older than SCRAPE_RUNS_KEEP_DAYS are pruned by the daily
+retention job; their counts move to scrape_totals.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from config import RSS_FEEDS, SCRAPE_RUNS_KEEP_DAYS
+from database import SessionLocal, WriteSessionLocal, ScrapeRun, ScrapeTotals
+
+# FeedStats fields exported per feed, with their Prometheus help text
+FEED_METRICS = [
+    ("fetch_seconds", "Seconds spent waiting on the feed server"),
+    ("bytes", "Feed body bytes downloaded"),
+    ("parse_seconds", "Seconds spent parsing the feed"),
+    ("entries_seen", "Entries read from the feed"),
+    ("filtered_by_date", "Entries skipped as undated or older than DAYS_LIMIT"),
+    ("unmatched", "Entries with no keyword match"),
+    ("match_seconds", "Seconds spent matching keywords"),
+    ("dedup_hits", "Matching entries already stored (or repeated in this run)"),
+    ("near_dups", "New entries that were near-duplicates of a stored story"),
+    ("inserted", "Articles inserted"),
+    ("insert_seconds", "Seconds spent on dedup queries and inserts"),
+]
+
+
+class FeedStats:
+    def __init__(self, feed_url, status=None):
+        self.feed_url = feed_url
+        self.status = status
+        self.error = None
+        for name, _ in FEED_METRICS:
+            setattr(self, name, 0)
+
+    def to_dict(self):
+        d = {"feed_url": self.feed_url, "status": self.status, "error": self.error}
+        for name, _ in FEED_METRICS:
+            value = getattr(self, name)
+            d[name] = round(value, 6) if isinstance(value, float) else value
+        return d
+
+
+class RunStats:
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.duration_seconds = None
+        self.feeds = {}
+        self.new_articles = 0
+        self.error = None
+
+    def feed(self, feed_url):
+        stats = self.feeds.get(feed_url)
+        if stats is None:
+            stats = self.feeds[feed_url] = FeedStats(feed_url)
+        return stats
+
+    def from_result(self, result):
+        """Start a feed's stats from a fetcher.FeedResult."""
+        stats = self.feed(result.feed_url)
+        stats.status = result.status
+        stats.fetch_seconds = result.fetch_seconds
+        stats.parse_seconds = result.parse_seconds
+        stats.bytes = result.bytes
+        if result.error is not None:
+            stats.error = str(result.error)
+        return stats
+
+    def finish(self):
+        self.duration_seconds = time.perf_counter() - self._started
+
+    @property
+    def feeds_failed(self):
+        return sum(1 for f in self.feeds.values() if f.error)
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": self.duration_seconds,
+            "new_articles": self.new_articles,
+            "error": self.error,
+            "feeds": [f.to_dict() for f in self.feeds.values()],
+        }
+
+
+def save_run(run):
+    """Persist a finished RunStats. Failures are logged, never raised."""
+    try:
+        with SessionLocal() as s:
+            s.add(ScrapeRun(
+                started_at=run.started_at,
+                finished_at=datetime.now(),
+                duration_seconds=run.duration_seconds,
+                feeds_total=len(run.feeds),
+                feeds_failed=run.feeds_failed,
+                new_articles=run.new_articles,
+                error=run.error,
+                stats=json.dumps([f.to_dict() for f in run.feeds.values()]),
+            ))
+            s.commit()
+    except Exception as e:
+        print(f"Could not record scrape run metrics: {e}")
+
+
+def recent_runs(session, limit=10):
+    """Latest runs, newest first, as dicts (per-feed stats decoded)."""
+    rows = session.query(ScrapeRun).order_by(ScrapeRun.id.desc()).limit(limit).all()
+    return [
+        {
+            "id": r.id,
+            "started_at": r.started_at.isoformat() if r.started_at else None,
+            "finished_at": r.finished_at.isoformat() if r.finished_at else None,
+            "duration_seconds": r.duration_seconds,
+            "feeds_total": r.feeds_total,
+            "feeds_failed": r.feeds_failed,
+            "new_articles": r.new_articles,
+            "error": r.error,
+            "feeds": json.loads(r.stats) if r.stats else [],
+        }
+        for r in rows
+    ]
+
+
+def latest_feed_stats(session, feed_urls=RSS_FEEDS, batch_size=200):
+    """
+    {feed_url: stats dict} from the newest run that covered each of `feed_urls`,
+    with "run_started_at" (datetime) added. Reads runs newest first until every
+    feed is found.
+    """
+    wanted = set(feed_urls)
+    latest = {}
+    before = None
+    while len(latest) < len(wanted):
+        q = session.query(ScrapeRun.id, ScrapeRun.started_at, ScrapeRun.stats)
+        if before is not None:
+            q = q.filter(ScrapeRun.id < before)
+        rows = q.order_by(ScrapeRun.id.desc()).limit(batch_size).all()
+        if not rows:
+            break
+        for run_id, started_at, stats in rows:
+            for f in json.loads(stats) if stats else []:
+                if f["feed_url"] in wanted and f["feed_url"] not in latest:
+                    latest[f["feed_url"]] = dict(f, run_started_at=started_at)
+        before = rows[-1][0]
+    return latest
+
+
+def prune_runs(keep_days=SCRAPE_RUNS_KEEP_DAYS):
+    """Delete runs started more than `keep_days` ago, adding them to scrape_totals. Returns how many."""
+    if not keep_days or keep_days <= 0:
+        return 0
+    cutoff = datetime.now() - timedelta(days=keep_days)
+    with WriteSessionLocal() as s:
+        runs, new_articles, failed = s.query(
+            func.count(ScrapeRun.id),
+            func.coalesce(func.sum(ScrapeRun.new_articles), 0),
+            func.coalesce(func.sum(ScrapeRun.feeds_failed), 0),
+        ).filter(ScrapeRun.started_at < cutoff).one()
+        if runs:
+            totals = s.get(ScrapeTotals, 1) or ScrapeTotals(id=1, runs=0, new_articles=0, feeds_failed=0)
+            totals.runs += runs
+            totals.new_articles += new_articles
+            totals.feeds_failed += failed
+            s.add(totals)
+            s.query(ScrapeRun).filter(ScrapeRun.started_at < cutoff).delete(synchronize_session=False)
+            s.commit()
+    if runs:
+        print(f"Pruned {runs} scrape run(s) older than {keep_days} days.")
+    return runs
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(session):
+    """
+    Prometheus text exposition: totals over all runs (pruned ones included), gauges
+    for the latest run, and per-feed gauges from each feed's latest run.
+    """
+    runs, new_articles, failed = session.query(
+        func.count(ScrapeRun.id),
+        func.coalesce(func.sum(ScrapeRun.new_articles), 0),
+        func.coalesce(func.sum(ScrapeRun.feeds_failed), 0),
+    ).one()
+    pruned = session.get(ScrapeTotals, 1)
+    if pruned is not None:
+        runs += pruned.runs
+        new_articles += pruned.new_articles
+        failed += pruned.feeds_failed
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_str = "{" + ",".join(f'{k}="{_label(v)}"' for k, v in labels.items()) + "}" if labels else ""
+            lines.append(f"{name}{label_str} {value}")
+
+    metric("scrape_runs_total", "counter", "Scrape runs recorded", [({}, runs)])
+    metric("scrape_new_articles_total", "counter", "Articles added over all runs", [({}, new_articles)])
+    metric("scrape_feed_errors_total", "counter", "Feed fetch/parse failures over all runs", [({}, failed)])
+
+    last = recent_runs(session, limit=1)
+    if last:
+        last = last[0]
+        started = datetime.fromisoformat(last["started_at"]).timestamp()
+        metric("scrape_last_run_timestamp_seconds", "gauge", "Start time of the latest run", [({}, started)])
+        metric("scrape_last_run_duration_seconds", "gauge", "Duration of the latest run",
+               [({}, last["duration_seconds"] or 0)])
+        metric("scrape_last_run_new_articles", "gauge", "Articles added by the latest run",
+               [({}, last["new_articles"])])
+        metric("scrape_last_run_failed", "gauge", "1 if the latest run aborted", [({}, int(bool(last["error"])))])
+
+    latest = latest_feed_stats(session) if last else {}
+    feeds = [latest[url] for url in dict.fromkeys(RSS_FEEDS) if url in latest]
+    if feeds:
+        metric("scrape_feed_last_run_timestamp_seconds", "gauge", "Start time of the feed's latest run",
+               [({"feed": f["feed_url"]}, f["run_started_at"].timestamp()) for f in feeds])
+        for name, help_text in FEED_METRICS:
+            metric(f"scrape_feed_{name}", "gauge", f"{help_text} (feed's latest run)",
+                   [({"feed": f["feed_url"]}, f.get(name, 0)) for f in feeds])
+        metric("scrape_feed_error", "gauge", "1 if the feed failed in its latest run",
+               [({"feed": f["feed_url"], "status": f["status"] or ""}, int(bool(f["error"])))
+                for f in feeds])
+    return "\n".join(lines) + "\n"
@@ -1,25 +1,38 @@
 # scraper.py
-import feedparser
 from datetime import datetime, timedelta
+import hashlib
 import time
-import ssl
 from sqlalchemy.exc import SQLAlchemyError
 
-from config import RSS_FEEDS, DAYS_LIMIT
-from database import SessionLocal, Article, Keyword
+from config import RSS_FEEDS, DAYS_LIMIT, KEYWORD_WORD_BOUNDARY, SCRAPE_COMMIT_EVERY, NEAR_DUP_ACTION
+from database import (
+    WriteSessionLocal, Article, ArticleTag, Keyword, FeedCache, split_tags, insert_ignore, chunked,
+)
+from feed_schedule import FeedObservation, UNCHANGED, record_polls
+from fetcher import fetch_feeds, STATUS_ERROR, STATUS_OK, STATUS_NOT_MODIFIED, STATUS_UNCHANGED
+from keyword_matcher import KeywordMatcher
+from near_dup import NearDupIndex, simhash, store_new_fingerprints
+from response_cache import bump_generation
+from scrape_metrics import RunStats, save_run
+from urls import clean_url, url_key
 
 def load_keywords(session):
     """Return a list of lowercased keywords from DB; empty list if none."""
     rows = session.query(Keyword.value).all()
     return [v for (v,) in rows]
 
-def get_matched_tags(entry, keywords_lower):
+def build_keyword_matcher(keywords_lower):
+    """Compile the keyword list once per run (see keyword_matcher.KeywordMatcher)."""
+    return KeywordMatcher(keywords_lower, word_boundary=KEYWORD_WORD_BOUNDARY)
+
+def get_matched_tags(entry, matcher):
     """
     Returns list of *original* matched keywords (as in DB, lowercased).
     We’ll return them lowercased (DB format) and display/serialize as-is later.
+    matcher: KeywordMatcher from build_keyword_matcher().
     """
     text = ((entry.get("title") or "") + " " + (entry.get("summary") or "")).lower()
-    return [kw for kw in keywords_lower if kw in text]
+    return matcher.match(text)
 
 def get_published_date(entry):
     published_struct = entry.get("published_parsed") or entry.get("updated_parsed")
@@ -32,67 +45,284 @@ def is_within_time_limit(published_dt):
         return False
     return datetime.now() - published_dt < timedelta(days=DAYS_LIMIT)
 
-def scrape_articles():
+def find_existing_keys(session, keys):
+    """Return the subset of url `keys` (see urls.url_key) already stored, one IN query per chunk."""
+    existing = set()
+    for chunk in chunked(keys):
+        existing.update(k for (k,) in session.query(Article.url_key).filter(Article.url_key.in_(chunk)))
+    return existing
+
+def insert_articles(session, rows):
+    """
+    Bulk insert article dicts; rows whose url_key already exists are ignored
+    (INSERT ... ON CONFLICT(url_key) DO NOTHING). Matching article_tags rows are
+    written for the inserted articles. Returns the number of articles inserted.
+    """
+    if not rows:
+        return 0
+    stmt = insert_ignore(Article.__table__, index_elements=["url_key"])
+    inserted = session.execute(stmt, rows).rowcount
+    if inserted is None or inserted < 0:
+        # Some drivers don't report executemany row counts; rows were pre-filtered by find_existing_keys
+        inserted = len(rows)
+
+    tags_by_key = {row["url_key"]: split_tags(row["tags"]) for row in rows}
+    tag_rows = []
+    for chunk in chunked(tags_by_key):
+        for (aid, key, published) in session.query(Article.id, Article.url_key, Article.published_date).filter(Article.url_key.in_(chunk)):
+            tag_rows.extend({"article_id": aid, "tag": tok, "published_date": published} for tok in tags_by_key[key])
+    if tag_rows:
+        session.execute(insert_ignore(ArticleTag.__table__), tag_rows)
+    return inserted
+
+def keywords_digest(keywords):
+    """Hash of the keyword set and matching mode; cached feed validators are tied to it."""
+    key = f"{KEYWORD_WORD_BOUNDARY}\n" + "\n".join(sorted(keywords))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def load_feed_cache(session):
+    """Return {feed_url: FeedCache} for every feed seen before."""
+    return {row.feed_url: row for row in session.query(FeedCache).all()}
+
+def update_feed_cache(session, cache, result, keywords_hash=None):
+    """
+    Record validators and hit/miss counters for a fetched feed (same transaction as its
+    articles), along with the keywords_digest() its entries were matched against.
+    """
+    row = cache.get(result.feed_url)
+    if row is None:
+        row = FeedCache(feed_url=result.feed_url, hits=0, misses=0)
+        session.add(row)
+        cache[result.feed_url] = row
+    row.etag = result.etag
+    row.last_modified = result.last_modified
+    row.content_hash = result.content_hash
+    row.keywords_hash = keywords_hash
+    row.updated_at = datetime.now()
+    if result.cache_hit:
+        row.hits = (row.hits or 0) + 1
+    else:
+        row.misses = (row.misses or 0) + 1
+
+def print_feed_cache_summary(cache, statuses):
+    """statuses: {feed_url: fetch status} for this run."""
+    hits = sum(1 for status in statuses.values() if status in (STATUS_NOT_MODIFIED, STATUS_UNCHANGED))
+    misses = sum(1 for status in statuses.values() if status == STATUS_OK)
+    errors = sum(1 for status in statuses.values() if status == STATUS_ERROR)
+    print(f"Feed cache: {hits} hit(s), {misses} miss(es), {errors} error(s).")
+    for feed_url, status in statuses.items():
+        row = cache.get(feed_url)
+        totals = f" (total {row.hits} hit / {row.misses} miss)" if row is not None else ""
+        print(f" - {status:<12} {feed_url}{totals}")
+
+def collect_candidates(feed, feed_url, matcher, added_keys, stats, dates=None):
+    """
+    Matching, in-window entries of a parsed feed as {url_key: article row}, first
+    occurrence wins. URLs are stored cleaned and deduped by canonical form (urls.py);
+    feedburner entries use the original link instead of the redirect wrapper.
+    dates: optional list that receives every entry's published date (for feed_schedule).
+    """
+    candidates = {}
+    for entry in feed.entries:
+        stats.entries_seen += 1
+        published_dt = get_published_date(entry)
+        if dates is not None:
+            dates.append(published_dt)
+        if not is_within_time_limit(published_dt):
+            stats.filtered_by_date += 1
+            continue
+
+        started = time.perf_counter()
+        matched_tags = get_matched_tags(entry, matcher)
+        stats.match_seconds += time.perf_counter() - started
+        if not matched_tags:
+            stats.unmatched += 1
+            continue
+
+        article_url = clean_url(entry.get("feedburner_origlink") or entry.get("link"))
+        if not article_url:
+            continue
+        key = url_key(article_url)
+        if key in added_keys or key in candidates:
+            stats.dedup_hits += 1
+            continue
+
+        # Store tags as ",tag1,tag2," for consistent filtering
+        unique_tags = sorted(set(matched_tags))
+        tags_str = "," + ",".join(unique_tags) + "," if unique_tags else ""
+
+        candidates[key] = dict(
+            title=entry.get("title", "No Title"),
+            url=article_url,
+            url_key=key,
+            published_date=published_dt,
+            summary=entry.get("summary") or "",
+            source=feed_url,
+            tags=tags_str,
+            content=""
+        )
+    return candidates
+
+def filter_near_dups(rows, near_index, stats):
+    """
+    Look each new row up in the near-duplicate index. Matches are counted, then
+    dropped (NEAR_DUP_ACTION=drop) or kept to be clustered. Returns (rows, {url: hash}).
+    """
+    kept, hashes = [], {}
+    for row in rows:
+        h = simhash(row["title"], row["summary"])
+        if h is not None:
+            match = near_index.find(h)
+            if match is not None:
+                stats.near_dups += 1
+                if NEAR_DUP_ACTION == "drop":
+                    continue
+            near_index.remember(h, row["url"], match)
+            hashes[row["url"]] = h
+        kept.append(row)
+    return kept, hashes
+
+def store_feed(session, cache, result, candidates, stats, commit_every=SCRAPE_COMMIT_EVERY, near_index=None,
+               keywords_hash=None):
+    """
+    Insert a feed's new articles and record its validators, committing every
+    `commit_every` rows (0 = one commit for the whole feed). The feed cache is only
+    updated with the last commit, so a feed that fails part-way is fetched and
+    parsed again next run (already committed rows are then skipped as duplicates).
+    near_index: optional near_dup.NearDupIndex; rows are fingerprinted in the same commit.
+    keywords_hash: keywords_digest() the candidates were matched with, stored with the validators.
+    Returns the number of articles inserted.
+    """
+    started = time.perf_counter()
+    # One IN query per feed instead of a SELECT per entry
+    existing = find_existing_keys(session, candidates)
+    if existing:
+        print(f"Skipping {len(existing)} duplicate article(s) from {result.feed_url}")
+    stats.dedup_hits += len(existing)
+    rows = [row for key, row in candidates.items() if key not in existing]
+    hashes = {}
+    if near_index is not None:
+        rows, hashes = filter_near_dups(rows, near_index, stats)
+
+    step = commit_every if commit_every > 0 else max(1, len(rows))
+    for i in range(0, len(rows), step):
+        chunk = rows[i:i + step]
+        inserted = insert_articles(session, chunk)
+        if hashes:
+            store_new_fingerprints(session, near_index, chunk, hashes)
+        last = i + step >= len(rows)
+        if last:
+            update_feed_cache(session, cache, result, keywords_hash)
+        if inserted:
+            bump_generation(session)  # cached API responses are stale now
+        session.commit()
+        stats.inserted += inserted
+    if not rows:
+        update_feed_cache(session, cache, result, keywords_hash)
+        session.commit()
+    stats.insert_seconds += time.perf_counter() - started
+    return stats.inserted
+
+def scrape_articles(feed_urls=None, progress=None):
+    """
+    Fetch feeds concurrently (see fetcher.fetch_feeds) and store matching entries.
+    This function is the single writer: only this thread touches the session.
+    Feeds that answer 304 or return a byte-identical body are not parsed at all.
+    Each feed is committed on its own (in SCRAPE_COMMIT_EVERY-row batches if set),
+    so new articles show up in the API while the run is going, and an error only
+    discards the uncommitted work of the feed it happened in.
+    progress: optional callable(feeds_done, feeds_total), called as each feed is handled.
+    Every requested feed's polling schedule is updated at the end (see feed_schedule.py).
+    Returns the run's RunStats (also saved to scrape_runs, see GET /metrics).
+    """
     print("Starting article scraping...")
-    session = SessionLocal()
+    session = WriteSessionLocal()  # takes the SQLite write lock per transaction, see database.py
+    run = RunStats()
     new_articles = 0
-    added_urls = set()
+    added_keys = set()
+    cache = {}
+    statuses = {}  # feed_url -> fetch status; parsed feeds are dropped once stored
+    observations = {}  # feed_url -> FeedObservation | UNCHANGED
+    feed_urls = list(dict.fromkeys(RSS_FEEDS if feed_urls is None else feed_urls))
 
     try:
         keywords = load_keywords(session)  # lowercased, unique
         if not keywords:
             print("No keywords configured; skipping scrape.")
             return
+        matcher = build_keyword_matcher(keywords)
+        near_index = NearDupIndex(session) if NEAR_DUP_ACTION != "off" else None
 
-        for feed_url in RSS_FEEDS:
-            print(f"Parsing feed: {feed_url}")
-            ssl._create_default_https_context = ssl._create_unverified_context
-            feed = feedparser.parse(feed_url)
-            if feed.bozo:
-                print(f" - Error parsing feed {feed_url}: possibly invalid RSS. Details: {feed.bozo_exception}")
-                continue
-
-            for entry in feed.entries:
-                published_dt = get_published_date(entry)
-                if not is_within_time_limit(published_dt):
-                    continue
+        keywords_hash = keywords_digest(keywords)
+        cache = load_feed_cache(session)
+        # After a keyword change every feed is fetched and parsed in full once, so
+        # entries it still carries are matched against the new keywords
+        validators = {
+            url: {"etag": row.etag, "last_modified": row.last_modified, "content_hash": row.content_hash}
+            for url, row in cache.items()
+            if row.keywords_hash == keywords_hash
+        }
+        session.commit()  # no transaction (or lock) stays open while feeds download
 
-                matched_tags = get_matched_tags(entry, keywords)
-                if not matched_tags:
-                    continue
+        for result in fetch_feeds(feed_urls, validators=validators):
+            feed_url = result.feed_url
+            statuses[feed_url] = result.status
+            stats = run.from_result(result)
+            if progress:
+                progress(len(statuses), len(feed_urls))
+            if result.status == STATUS_ERROR:
+                print(f" - Error fetching feed {feed_url}: {result.error}")
+                continue
 
-                article_url = entry.get("link") or ""
-                if not article_url:
+            try:
+                if result.cache_hit:
+                    observations[feed_url] = UNCHANGED
+                    print(f"Feed unchanged ({result.status}): {feed_url}")
+                    update_feed_cache(session, cache, result, keywords_hash)
+                    session.commit()
                     continue
 
-                if session.query(Article).filter(Article.url == article_url).first() or article_url in added_urls:
-                    print(f"Skipping duplicate article: {article_url}")
+                print(f"Parsing feed: {feed_url}")
+                feed = result.feed
+                if feed.bozo:
+                    print(f" - Error parsing feed {feed_url}: possibly invalid RSS. Details: {feed.bozo_exception}")
+                    stats.error = f"parse error: {feed.bozo_exception}"
                     continue
 
-                summary = entry.get("summary") or ""
-
-                # Store tags as ",tag1,tag2," for consistent filtering
-                unique_tags = sorted(set(matched_tags))
-                tags_str = "," + ",".join(unique_tags) + "," if unique_tags else ""
-
-                article = Article(
-                    title=entry.get("title", "No Title"),
-                    url=article_url,
-                    published_date=published_dt,
-                    summary=summary,
-                    source=feed_url,
-                    tags=tags_str,
-                    content=""
-                )
-                session.add(article)
-                added_urls.add(article_url)
-                new_articles += 1
-
-        session.commit()
+                dates = []
+                candidates = collect_candidates(feed, feed_url, matcher, added_keys, stats, dates)
+                observations[feed_url] = FeedObservation(len(feed.entries), dates)
+                new_articles += store_feed(session, cache, result, candidates, stats, near_index=near_index,
+                                           keywords_hash=keywords_hash)
+                added_keys.update(candidates)
+            except Exception as e:
+                # Only this feed's uncommitted rows are lost; earlier feeds stay committed
+                session.rollback()
+                new_articles += stats.inserted
+                stats.error = f"store error: {e}"
+                print(f" - Error storing feed {feed_url}: {e}")
+                cache = load_feed_cache(session)
+                session.commit()
+            finally:
+                # Only one parsed feed is alive at a time, however many feeds the run has
+                result.feed = feed = candidates = None
     except Exception as e:
         session.rollback()
+        run.error = str(e)
         print(f"Error during scraping: {e}")
     finally:
+        if statuses:
+            print_feed_cache_summary(cache, statuses)
+        try:
+            record_polls(session, feed_urls, observations)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Could not update the feed schedule: {e}")
         session.close()
 
+    run.new_articles = new_articles
+    run.finish()
+    save_run(run)
     print(f"Article scraping finished. {new_articles} new articles added.")
+    return run
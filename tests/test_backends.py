@@ -0,0 +1,94 @@
+# tests/test_backends.py
+"""Scraping and the search API end to end, on every configured backend (see conftest.database_url)."""
+import json
+
+from conftest import rss_feed, run_app
+
+SCRAPE_TWICE = """
+import json
+from database import init_db, SessionLocal, Article, ArticleTag, Keyword
+init_db()
+init_db()  # startup migrations are idempotent
+from scraper import scrape_articles
+urls = {urls!r}
+first, second = scrape_articles(urls), scrape_articles(urls)
+with SessionLocal() as s:
+    print(json.dumps({{
+        "first": first.new_articles,
+        "second": second.new_articles,
+        "second_statuses": sorted({{f.status for f in second.feeds.values()}}),
+        "articles": s.query(Article).count(),
+        "urls": s.query(Article.url).distinct().count(),
+        "tagged": s.query(ArticleTag.article_id).distinct().count(),
+    }}))
+"""
+
+SEARCH_PAGES = """
+import json
+from datetime import datetime, timedelta
+from database import Base, engine, Article
+Base.metadata.create_all(bind=engine)
+base = datetime(2024, 5, 1, 12, 0)
+rows = []
+for i in range(40):
+    # Repeated dates (ties broken by id) and some undated rows, which sort last
+    published = None if i % 9 == 0 else base - timedelta(hours=i // 3)
+    tags = ",ai," if i % 2 else ",fusion energy,"
+    rows.append({{"title": f"Article {{i}}", "url": f"https://example.com/{{i}}", "summary": "",
+                  "source": "test", "tags": tags, "content": "", "published_date": published}})
+with engine.begin() as conn:
+    conn.execute(Article.__table__.insert(), rows)
+
+from app import app  # init_db(): article_tags, cache state, keyword seed
+client = app.test_client()
+
+def ids(body):
+    return [a["id"] for a in body["articles"]]
+
+out = {{}}
+offset = client.post("/articles/search", json={{"page": 1, "page_size": 100, "include_total": True}}).get_json()
+out["offset_ids"], out["total"] = ids(offset), offset["total"]
+out["offset_dates"] = [a["published_date"] for a in offset["articles"]]
+cursor, seen = None, []
+while True:
+    page = client.post("/articles/search", json={{"page_size": 7, "cursor": cursor}}).get_json()
+    seen += ids(page)
+    cursor = page["next_cursor"]
+    if not cursor:
+        break
+out["cursor_ids"] = seen
+tagged = client.post("/articles/search", json={{"page": 1, "page_size": 100, "tags": ["AI"]}}).get_json()
+out["tagged_titles"] = sorted(a["title"] for a in tagged["articles"])
+print(json.dumps(out))
+"""
+
+
+def _last_json(stdout):
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def test_scrape_is_idempotent(database_url, feed_server):
+    keyword = _last_json(run_app(database_url, (
+        "import json\n"
+        "from database import init_db, SessionLocal, Keyword\n"
+        "init_db()\n"
+        "with SessionLocal() as s: print(json.dumps(s.query(Keyword.value).order_by(Keyword.value).first()[0]))\n"
+    )))
+    feeds, entries = 3, 5
+    urls = feed_server({f"/feed/{i}.xml": rss_feed(i, entries, keyword) for i in range(feeds)})
+    result = _last_json(run_app(database_url, SCRAPE_TWICE.format(urls=urls)))
+    assert result["first"] == feeds * entries
+    assert result["second"] == 0
+    assert result["second_statuses"] == ["not_modified"]
+    assert result["articles"] == result["urls"] == result["tagged"] == feeds * entries
+
+
+def test_search_pages_agree(database_url):
+    result = _last_json(run_app(database_url, SEARCH_PAGES.format()))
+    assert result["total"] == 40
+    # Newest first, undated rows last, and cursor pages walk exactly the offset order
+    dates = result["offset_dates"]
+    dated = [d for d in dates if d]
+    assert dates[:len(dated)] == dated and dated == sorted(dated, reverse=True)
+    assert result["cursor_ids"] == result["offset_ids"]
+    assert result["tagged_titles"] == sorted(f"Article {i}" for i in range(1, 40, 2))
@@ -0,0 +1,37 @@
+# tests/test_profiling.py
+import re
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def client():
+    from app import app
+    return app.test_client()
+
+
+def _queries(response):
+    match = re.search(r'desc="(\d+) queries"', response.headers.get("Server-Timing", ""))
+    assert match, response.headers
+    return int(match.group(1))
+
+
+def test_read_route_counts_queries(client):
+    response = client.get("/keywords", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert _queries(response) > 0
+
+
+def test_write_routes_count_queries(client):
+    # POST/DELETE /keywords run on WriteSessionLocal, i.e. write_engine, not engine
+    response = client.post("/keywords", json={"keyword": "profiling probe"}, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert _queries(response) > 0
+
+    response = client.delete("/keywords/profiling probe", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert _queries(response) > 0
+
+
+def test_unprofiled_request_has_no_header(client):
+    assert "Server-Timing" not in client.get("/keywords").headers
@@ -0,0 +1,56 @@
+# tests/test_work_queue.py
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+
+from conftest import REPO_DIR, rss_feed, run_app
+from database import Article, FeedWork, Keyword, ScrapeRun
+
+LEASE_SECONDS = 3
+
+
+def test_workers_claim_each_feed_once_and_recover_a_dead_lease(database_url, feed_server):
+    """Several `worker.py --queue` processes on one database; feed 0 starts leased by a dead worker."""
+    feeds, entries, workers = 12, 4, 3
+    run_app(database_url, "from database import init_db; init_db()")
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        keyword = conn.execute(select(Keyword.value).limit(1)).scalar()
+        now = datetime.now()
+        urls = feed_server({f"/feed/{i}.xml": rss_feed(i, entries, keyword) for i in range(feeds)})
+        conn.execute(FeedWork.__table__.insert().values(
+            key=urls[0], available_at=now, attempts=0, lease_owner="dead-worker",
+            lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+        ))
+
+    env = dict(os.environ, DATABASE_URI=database_url, RSS_FEEDS=",".join(urls),
+               QUEUE_CLAIM_BATCH="2", QUEUE_IDLE_SECONDS="0.2",
+               QUEUE_LEASE_SECONDS=str(LEASE_SECONDS), QUEUE_HEARTBEAT_SECONDS="1")
+    procs = [
+        subprocess.Popen([sys.executable, "worker.py", "--queue", "--exit-when-idle"], cwd=REPO_DIR, env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    errors = [p.communicate(timeout=300)[1] for p in procs]
+    assert [p.returncode for p in procs] == [0] * workers, errors
+
+    with engine.connect() as conn:
+        scraped, started = {}, {}
+        for started_at, stats in conn.execute(select(ScrapeRun.started_at, ScrapeRun.stats)):
+            for f in json.loads(stats or "[]"):
+                scraped[f["feed_url"]] = scraped.get(f["feed_url"], 0) + 1
+                started[f["feed_url"]] = started_at
+        rows = {r.key: r for r in conn.execute(select(FeedWork.__table__))}
+        articles = conn.execute(select(func.count(Article.id))).scalar()
+
+    assert {url: scraped.get(url, 0) for url in urls} == {url: 1 for url in urls}
+    assert [key for key, r in rows.items() if r.lease_owner] == []
+    # Feed 0 waited for the dead worker's lease to run out, then another worker took it
+    dead = rows[urls[0]]
+    assert dead.completed_at is not None and dead.last_owner != "dead-worker"
+    assert started[urls[0]] >= now + timedelta(seconds=LEASE_SECONDS)
+    assert articles == feeds * entries
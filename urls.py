@@ -0,0 +1,69 @@
+# urls.py
+"""
+Article URL canonicalization and the compact dedup key.
+
+The same story reaches us under several URLs: with utm_* and other tracking
+parameters, over http and https, with or without "www." or a trailing slash.
+
+- clean_url() is what the scraper stores: tracking parameters and the fragment
+  removed, otherwise as published.
+- canonical_url() additionally normalizes scheme, host, port, path slashes and
+  query order. It is only used to compute the key.
+- url_key() is a 64-bit hash of canonical_url(), stored in Article.url_key with
+  a unique index; dedup and lookups go through it instead of the long url text.
+  At 64 bits a collision is not a practical concern (it would drop one article).
+"""
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid",
+    "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok", "ocid", "cmpid", "ncid",
+})
+_SLASHES_RE = re.compile(r"/{2,}")
+
+
+def _is_tracking(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def clean_url(url):
+    """URL as stored: trimmed, without the fragment and tracking parameters."""
+    url = (url or "").strip()
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    query = parts.query
+    params = parse_qsl(query, keep_blank_values=True)
+    if any(_is_tracking(k) for k, _ in params):
+        # Only re-encode when something is removed; otherwise keep the query byte-for-byte
+        query = urlencode([(k, v) for k, v in params if not _is_tracking(k)])
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def canonical_url(url):
+    """
+    clean_url() normalized for comparison: https, lowercase host without "www."
+    and default ports, duplicate/trailing slashes removed, query sorted.
+    """
+    parts = urlsplit(clean_url(url))
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = _SLASHES_RE.sub("/", parts.path).rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def url_key(url):
+    """Signed 64-bit key (fits BIGINT) for the canonical form of `url`."""
+    digest = hashlib.blake2b(canonical_url(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
@@ -0,0 +1,305 @@
+# work_queue.py
+"""
+DB-backed lease queue, so any number of scraper processes on one or more hosts
+can share the feeds without scraping one twice:
+
+    SCHEDULER_MODE=maintenance gunicorn app:app   # web workers never scrape
+    python worker.py --queue                       # start as many as needed, anywhere
+
+feed_work_queue has one row per feed (due again when feed_schedule says so)
+plus a "task:content" row for the body fetch that follows scraping. Retention is
+not queued: it writes the archive file the web tier serves searches from, so it
+runs on the web host (SCHEDULER_MODE=maintenance). Workers drop any
+"task:retention" row left by older versions instead of archiving on their own host.
+A worker claims due rows with a compare-and-set UPDATE that only matches rows
+without a live lease, renews its leases from a heartbeat thread while it works,
+and releases them when done. If a worker dies, its leases run out after
+QUEUE_LEASE_SECONDS and the rows are re-queued for the others.
+"""
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from config import (
+    RSS_FEEDS, CONTENT_FETCH_ENABLED, POLL_MIN_INTERVAL_MINUTES,
+    QUEUE_LEASE_SECONDS, QUEUE_HEARTBEAT_SECONDS, QUEUE_CLAIM_BATCH, QUEUE_IDLE_SECONDS,
+    QUEUE_RETRY_SECONDS, QUEUE_CONTENT_INTERVAL_SECONDS,
+)
+from content_fetcher import fetch_missing_content
+from database import WriteSessionLocal, FeedSchedule, FeedWork, insert_ignore
+from scraper import scrape_articles
+
+TASK_PREFIX = "task:"
+TASK_CONTENT = TASK_PREFIX + "content"
+
+
+def worker_id():
+    """Unique lease owner name: host, pid and a random suffix."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _tasks():
+    tasks = []
+    if CONTENT_FETCH_ENABLED:
+        tasks.append(TASK_CONTENT)
+    return tasks
+
+
+def _claimable(now):
+    return and_(
+        FeedWork.available_at <= now,
+        or_(FeedWork.lease_owner.is_(None), FeedWork.lease_expires_at < now),
+    )
+
+
+def sync_queue(session, feed_urls):
+    """Add rows for new feeds/tasks and drop unleased rows that are no longer configured. Commits."""
+    now = datetime.now()
+    keys = list(dict.fromkeys(feed_urls)) + _tasks()
+    session.execute(insert_ignore(FeedWork.__table__),
+                    [{"key": key, "available_at": now, "attempts": 0} for key in keys])
+    session.query(FeedWork).filter(~FeedWork.key.in_(keys), FeedWork.lease_owner.is_(None)) \
+           .delete(synchronize_session=False)
+    session.commit()
+
+
+def requeue_expired(session):
+    """Free leases whose owner stopped heartbeating. Returns how many. Commits."""
+    now = datetime.now()
+    n = (
+        session.query(FeedWork)
+               .filter(FeedWork.lease_owner.isnot(None), FeedWork.lease_expires_at < now)
+               .update({
+                   FeedWork.last_owner: FeedWork.lease_owner,
+                   FeedWork.lease_owner: None,
+                   FeedWork.lease_expires_at: None,
+                   FeedWork.attempts: FeedWork.attempts + 1,
+                   FeedWork.last_error: "lease expired",
+               }, synchronize_session=False)
+    )
+    session.commit()
+    return n
+
+
+def claim(session, owner, limit=QUEUE_CLAIM_BATCH):
+    """Lease up to `limit` due rows, longest-waiting first. Returns the claimed keys. Commits."""
+    now = datetime.now()
+    candidates = [
+        key for (key,) in session.query(FeedWork.key)
+                                 .filter(_claimable(now))
+                                 .order_by(FeedWork.available_at.asc())
+                                 .limit(limit)
+    ]
+    claimed = []
+    for key in candidates:
+        # Compare-and-set: matches nothing if another worker leased the row since the SELECT
+        n = (
+            session.query(FeedWork)
+                   .filter(FeedWork.key == key, _claimable(now))
+                   .update({
+                       FeedWork.lease_owner: owner,
+                       FeedWork.lease_expires_at: now + timedelta(seconds=QUEUE_LEASE_SECONDS),
+                   }, synchronize_session=False)
+        )
+        if n:
+            claimed.append(key)
+    session.commit()
+    return claimed
+
+
+def has_due(session):
+    """True while any row is due, leased or not (i.e. work is pending or in progress)."""
+    return session.query(FeedWork.key).filter(FeedWork.available_at <= datetime.now()).limit(1).first() is not None
+
+
+def heartbeat(session, owner, keys):
+    """Extend `owner`'s leases on `keys`. Returns how many are still held. Commits."""
+    n = (
+        session.query(FeedWork)
+               .filter(FeedWork.key.in_(list(keys)), FeedWork.lease_owner == owner)
+               .update({FeedWork.lease_expires_at: datetime.now() + timedelta(seconds=QUEUE_LEASE_SECONDS)},
+                       synchronize_session=False)
+    )
+    session.commit()
+    return n
+
+
+def release(session, owner, key, available_at, error=None):
+    """
+    Give a row back, due again at `available_at`. `error` counts as a failed attempt.
+    Returns False if the lease had already been lost to another worker. Commits.
+    """
+    values = {
+        FeedWork.lease_owner: None,
+        FeedWork.lease_expires_at: None,
+        FeedWork.available_at: available_at,
+        FeedWork.last_owner: owner,
+    }
+    if error is None:
+        values.update({FeedWork.attempts: 0, FeedWork.last_error: None, FeedWork.completed_at: datetime.now()})
+    else:
+        values.update({FeedWork.attempts: FeedWork.attempts + 1, FeedWork.last_error: error[:1000]})
+    n = (
+        session.query(FeedWork)
+               .filter(FeedWork.key == key, FeedWork.lease_owner == owner)
+               .update(values, synchronize_session=False)
+    )
+    session.commit()
+    return bool(n)
+
+
+def drop(session, owner, key):
+    """Delete a row `owner` holds the lease on. Returns False if the lease was lost. Commits."""
+    n = session.query(FeedWork).filter(FeedWork.key == key, FeedWork.lease_owner == owner) \
+               .delete(synchronize_session=False)
+    session.commit()
+    return bool(n)
+
+
+def queue_summary(session):
+    """Every queue row, soonest due first."""
+    rows = session.query(FeedWork).order_by(FeedWork.available_at.asc()).all()
+    return [
+        {
+            "key": r.key,
+            "available_at": r.available_at.isoformat(),
+            "lease_owner": r.lease_owner,
+            "lease_expires_at": r.lease_expires_at.isoformat() if r.lease_expires_at else None,
+            "attempts": r.attempts,
+            "last_error": r.last_error,
+            "last_owner": r.last_owner,
+            "completed_at": r.completed_at.isoformat() if r.completed_at else None,
+        }
+        for r in rows
+    ]
+
+
+class LeaseKeeper(threading.Thread):
+    """Renews the leases a worker currently holds every QUEUE_HEARTBEAT_SECONDS."""
+
+    def __init__(self, owner, interval=QUEUE_HEARTBEAT_SECONDS):
+        super().__init__(name="lease-heartbeat", daemon=True)
+        self.owner = owner
+        self.interval = interval
+        self._keys = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def hold(self, keys):
+        with self._lock:
+            self._keys.update(keys)
+
+    def drop(self, keys):
+        with self._lock:
+            self._keys.difference_update(keys)
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            with self._lock:
+                keys = list(self._keys)
+            if not keys:
+                continue
+            try:
+                with WriteSessionLocal() as s:
+                    held = heartbeat(s, self.owner, keys)
+                if held < len(keys):
+                    print(f"Lost {len(keys) - held} lease(s); another worker may be processing them.")
+            except Exception as e:
+                print(f"Lease heartbeat failed: {e}")
+
+
+def _run_task(task):
+    if task == TASK_CONTENT:
+        fetch_missing_content()
+        return datetime.now() + timedelta(seconds=QUEUE_CONTENT_INTERVAL_SECONDS)
+    raise ValueError(f"unknown task {task}")
+
+
+def process(owner, keys):
+    """Run one claimed batch (feeds in one scrape, then tasks) and release every row."""
+    feeds = [k for k in keys if not k.startswith(TASK_PREFIX)]
+    if feeds:
+        error = None
+        try:
+            run = scrape_articles(feeds)
+        except Exception as e:
+            run, error = None, str(e)
+        now = datetime.now()
+        with WriteSessionLocal() as s:
+            next_poll = dict(
+                s.query(FeedSchedule.feed_url, FeedSchedule.next_poll_at).filter(FeedSchedule.feed_url.in_(feeds))
+            )
+            for feed_url in feeds:
+                feed_error = error or (run.feeds[feed_url].error if run and feed_url in run.feeds else None)
+                if error is not None:
+                    due = now + timedelta(seconds=QUEUE_RETRY_SECONDS)
+                else:
+                    due = next_poll.get(feed_url) or now + timedelta(minutes=POLL_MIN_INTERVAL_MINUTES)
+                if not release(s, owner, feed_url, due, feed_error):
+                    print(f"Lease on {feed_url} was lost before release.")
+
+    for task in (k for k in keys if k.startswith(TASK_PREFIX)):
+        if task not in _tasks():
+            # e.g. "task:retention" from before retention left the queue: this host
+            # cannot see the web tier's archive, so the row is removed, not run
+            print(f"Dropping task {task}: not run by queue workers.")
+            with WriteSessionLocal() as s:
+                drop(s, owner, task)
+            continue
+        error = None
+        try:
+            due = _run_task(task)
+        except Exception as e:
+            error = str(e)
+            due = datetime.now() + timedelta(seconds=QUEUE_RETRY_SECONDS)
+            print(f"Task {task} failed: {e}")
+        with WriteSessionLocal() as s:
+            release(s, owner, task, due, error)
+
+
+def run_worker(owner=None, exit_when_idle=False, stop_event=None):
+    """
+    Claim / scrape / release loop for `python worker.py --queue`.
+    exit_when_idle: return once nothing is due, including rows other workers still
+    hold, so expired leases get picked up (tests, benchmarks, cron).
+    Returns the number of batches processed.
+    """
+    owner = owner or worker_id()
+    stop_event = stop_event or threading.Event()
+    keeper = LeaseKeeper(owner)
+    keeper.start()
+    print(f"Queue worker {owner} started.")
+    with WriteSessionLocal() as s:
+        sync_queue(s, RSS_FEEDS)
+
+    batches = 0
+    try:
+        while not stop_event.is_set():
+            with WriteSessionLocal() as s:
+                expired = requeue_expired(s)
+                keys = claim(s, owner)
+                idle = not keys and not has_due(s)
+            if expired:
+                print(f"Re-queued {expired} expired lease(s).")
+            if not keys:
+                if exit_when_idle and idle:
+                    break
+                stop_event.wait(QUEUE_IDLE_SECONDS)
+                continue
+            keeper.hold(keys)
+            try:
+                process(owner, keys)
+            finally:
+                keeper.drop(keys)
+            batches += 1
+    finally:
+        keeper.stop()
+    print(f"Queue worker {owner} stopped after {batches} batch(es).")
+    return batches
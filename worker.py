@@ -0,0 +1,60 @@
+# worker.py
+"""
+Standalone scraper process. Run the web app with SCHEDULER_MODE=off and this
+alongside it:
+
+    python worker.py            # one per deployment: initial scrape, then the schedule
+    python worker.py --queue    # any number, on any host: share feeds via feed_work_queue
+                                # (then run the web app with SCHEDULER_MODE=maintenance)
+
+The default mode runs the initial scrape, then the schedule (see SCHEDULE_MODE),
+in the foreground. --queue mode is described in work_queue.py.
+"""
+import argparse
+import sys
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from database import init_db
+from near_dup import backfill_fingerprints
+from scheduler import acquire_scheduler_lock, add_jobs, initial_job
+from work_queue import run_worker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Standalone scraper process.")
+    parser.add_argument("--queue", action="store_true",
+                        help="lease feeds from the shared DB queue instead of running the scheduler")
+    parser.add_argument("--exit-when-idle", action="store_true",
+                        help="with --queue: exit once no feed is due")
+    args = parser.parse_args(argv)
+
+    init_db()
+    backfill_fingerprints()
+
+    if args.queue:
+        try:
+            run_worker(exit_when_idle=args.exit_when_idle)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if not acquire_scheduler_lock():
+        print("Scheduler already running in another process; exiting.")
+        return 1
+
+    print("Running initial scraping job...")
+    initial_job()
+
+    scheduler = BlockingScheduler()
+    add_jobs(scheduler)
+    print("Worker scheduler started.")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())